@@ -1,23 +1,57 @@
 import os
 import re
 import json
+import time
+import hashlib
 import logging
+import functools
+import string
+import math
+import sqlite3
+import threading
+import hmac
+import asyncio
+import gzip
+import base64
+import glob
+import heapq
+import itertools
+import multiprocessing
+import concurrent.futures
+import sys
+import io
+import marshal
+import tempfile
+import cProfile
+import pstats
+import tracemalloc
+import contextvars
+from collections import OrderedDict, deque
+from concurrent.futures.process import BrokenProcessPool
 from typing import List, Optional, Literal, Dict, Any
 
+import yaml
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, Security, Request
+from fastapi import FastAPI, HTTPException, Security, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import FileResponse, RedirectResponse, JSONResponse
+from fastapi.responses import RedirectResponse, JSONResponse, StreamingResponse, Response
+from pydantic import BaseModel, ValidationError
+from starlette.requests import ClientDisconnect
 from fastapi.openapi.utils import get_openapi
 from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
 
 # ---- 모든 데이터 모델은 models.py에서만 정의하고 여기서는 임포트만 ----
 from models import (
     AlbumInfo, Controls, DeriveConceptsRequest, Concept, DeriveConceptsResponse,
+    ConceptGenerateRequest, ConceptStreamRequest, ConceptPage,
     ComposeStillsRequest, MJPrompt, ComposeStillsResponse,
-    ExpandSceneRequest, TimelineBeat, SceneDraft, ExpandSceneResponse,
-    QAReport, QAValidateRequest, QAValidateResponse
+    ExpandSceneRequest, TimelineBeat, SceneST, SceneDS, SceneDW, SceneDraft, ExpandSceneResponse,
+    QAReport, QAValidateRequest, QAValidateResponse,
+    JSONPatchOp, QAIncrementalRequest, QACheckDiff, QAIncrementalResponse,
+    PipelineItem, PipelineResult, PipelineBatchRequest, PipelineBatchResponse,
+    StoryboardRequest, StoryboardScene, set_scene_strict,
+    SceneSearchRequest, SceneVariant, SceneCandidate, SceneSearchResponse,
 )
 
 # -----------------------------
@@ -25,17 +59,48 @@ from models import (
 # -----------------------------
 load_dotenv()
 
+# SCENE_STRICT=1: scene의 st/ds/dw를 예전 dict 호환 어댑터 없이 strict 검증 (점수 계산 전에 422)
+set_scene_strict(os.getenv("SCENE_STRICT", "0") == "1")
+
 APP_NAME = "DirectorOS Actions API (v0.3.1a)"
 security = HTTPBearer(auto_error=False)
 
 # -----------------------------
 # Auth dependency (Bearer)
 # -----------------------------
-def require_bearer(credentials: HTTPAuthorizationCredentials = Security(security)):
-    expected = os.getenv("ACTIONS_BEARER", "").strip()
-    if not expected:
+# ACTIONS_BEARERS="id:token,id2:token2" (id 생략 가능) + 기존 ACTIONS_BEARER(id "default"). 시작 시 한 번만 파싱
+def _parse_keyring() -> Dict[str, str]:
+    ring: Dict[str, str] = {}
+    legacy = os.getenv("ACTIONS_BEARER", "").strip()
+    if legacy:
+        ring["default"] = legacy
+    for i, item in enumerate(x.strip() for x in os.getenv("ACTIONS_BEARERS", "").split(",")):
+        if not item:
+            continue
+        key_id, sep, token = item.partition(":")
+        if not sep:
+            key_id, token = f"key{i + 1}", item
+        ring[key_id.strip()] = token.strip()
+    return {k: v for k, v in ring.items() if v}
+
+_KEYRING = _parse_keyring()
+_KEYRING_BYTES = [(k, v.encode()) for k, v in _KEYRING.items()]
+
+def _match_token(presented: Optional[str]) -> Optional[str]:
+    """key id 또는 None. 모든 키와 상수 시간 비교 (일치해도 끝까지 돈다)."""
+    if not presented:
+        return None
+    raw = presented.encode()
+    found = None
+    for key_id, token in _KEYRING_BYTES:
+        if hmac.compare_digest(raw, token):
+            found = key_id
+    return found
+
+async def require_bearer(credentials: HTTPAuthorizationCredentials = Security(security)):
+    if not _KEYRING:
         raise HTTPException(status_code=500, detail="Server misconfigured: ACTIONS_BEARER not set")
-    if credentials is None or credentials.credentials != expected:
+    if credentials is None or _match_token(credentials.credentials) is None:
         raise HTTPException(status_code=401, detail="Unauthorized", headers={"WWW-Authenticate": "Bearer"})
     return True
 
@@ -69,50 +134,533 @@ def custom_openapi():
 
 
 app.add_middleware(ProxyHeadersMiddleware, trusted_hosts="*")
-
-app.add_middleware(CORSMiddleware, allow_origins=allowlist,
-    allow_credentials=False,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# CORSMiddleware 는 admission 바로 바깥에 건다 (Admission control 섹션)
 
 # -----------------------------
 # Endpoints
 # -----------------------------
 @app.get("/health", summary="Health", operation_id="getHealth")
-def health():
+async def health():
     return {"ok": True, "name": APP_NAME, "version": "0.3.1a"}
 
 @app.get("/privacy", summary="Privacy", operation_id="getPrivacy")
-def privacy():
-    if os.path.exists("privacy.html"):
-        return FileResponse("privacy.html", media_type="text/html")
-    return JSONResponse({"ok": True, "privacy": "no file; default response"})
+async def privacy(request: Request):
+    return _asset_response(request, "privacy")
 
 @app.get("/", include_in_schema=False)
-def root():
+async def root():
     return RedirectResponse(url="/docs")
 
 @app.post("/derive-concepts", operation_id="deriveConcepts", response_model=DeriveConceptsResponse)
-def derive_concepts(payload: DeriveConceptsRequest, _: bool = Security(require_bearer)):
+async def derive_concepts(payload: DeriveConceptsRequest, request: Request, _: bool = Security(require_bearer)):
+    return await _cached_json("deriveConcepts", payload, request, _derive_concepts_core)
+
+@app.post("/compose-stills", operation_id="composeStills", response_model=ComposeStillsResponse)
+async def compose_stills(payload: ComposeStillsRequest, request: Request, _: bool = Security(require_bearer)):
+    return await _cached_json("composeStills", _resolved(payload), request, _compose_stills_core)
+
+@app.post("/expand-scene", operation_id="expandScene", response_model=ExpandSceneResponse)
+async def expand_scene(payload: ExpandSceneRequest, request: Request, _: bool = Security(require_bearer)):
+    return await _cached_json("expandScene", _resolved(payload), request, _expand_scene_core)
+
+# -----------------------------
+# Response cache (요청 본문의 canonical hash → 응답 bytes, ETag/304)
+# -----------------------------
+RESP_CACHE_MAX_BYTES = int(os.getenv("RESP_CACHE_MAX_BYTES", str(32 << 20)))
+RESP_CACHE_TTL_SEC = float(os.getenv("RESP_CACHE_TTL_SEC", "600"))
+_CACHE_ENTRY_OVERHEAD = 200
+
+class _ResponseCache:
+    """LRU + TTL, 총 bytes 상한. 값은 (body, etag, expires_at, puts).
+
+    puts: miss 때 core가 store에 넣은 (kind, id, obj | raw). HIT이면 core를 안 돌리므로 다시 넣어 준다.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._d: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    @staticmethod
+    def _size(body: bytes, puts: tuple) -> int:
+        return len(body) + _CACHE_ENTRY_OVERHEAD + sum(len(o) for _, _, o, _ in puts if isinstance(o, bytes))
+
+    def _drop(self, key: str):
+        body, _, _, puts = self._d.pop(key)
+        self._bytes -= self._size(body, puts)
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._d.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[2] < time.monotonic():
+                self._drop(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._d.move_to_end(key)
+            self.hits += 1
+            return entry[0], entry[1], entry[3]
+
+    def put(self, key: str, body: bytes, etag: str, puts: tuple = ()):
+        size = self._size(body, puts)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._d:
+                self._drop(key)
+            self._d[key] = (body, etag, time.monotonic() + self.ttl, puts)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._d)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._d.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._d), "bytes": self._bytes, "max_bytes": self.max_bytes, "ttl_sec": self.ttl,
+            "hits": self.hits, "misses": self.misses, "evictions": self.evictions, "expirations": self.expirations,
+        }
+
+_RESP_CACHE = _ResponseCache(RESP_CACHE_MAX_BYTES, RESP_CACHE_TTL_SEC)
+
+def _cache_key(op: str, payload) -> str:
+    canon = json.dumps(payload.model_dump(mode="json"), sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(f"{op}\0{canon}".encode()).hexdigest()
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    bare = etag.removeprefix("W/")
+    return any(t.strip().removeprefix("W/") == bare for t in header.split(","))
+
+def _dump_json(obj) -> bytes:
+    """신뢰하는 모델 인스턴스 → JSON bytes. 클래스에 미리 빌드된 pydantic-core serializer를 바로 쓴다
+    (model_dump_json의 str 왕복도, response_model 재검증도 없음)."""
+    return type(obj).__pydantic_serializer__.to_json(obj)
+
+async def _cached_json(op: str, payload, request: Request, core) -> Response:
+    """순수 함수 엔드포인트 공용: 캐시 조회 → (miss면) op 정책의 lane에서 계산/직렬화 → ETag, If-None-Match면 304."""
+    timing = _timing(request)
+    t = time.perf_counter()
+    if timing is not None:
+        timing["validate"] = (t - timing["t0"]) * 1000
+    key = _cache_key(op, payload)
+    hit = _RESP_CACHE.get(key)
+    if hit is None:
+        puts: list = []
+        body = await _execute(op, core, payload, timing, puts=puts)
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        _RESP_CACHE.put(key, body, etag, tuple(puts))
+    else:
+        body, etag, puts = hit
+        _STORE.restore(puts)   # 응답이 가리키는 concept/scene id가 store에서 밀려났어도 다시 참조되게
+        if timing is not None:
+            timing["cache"] = (time.perf_counter() - t) * 1000
+    headers = {"ETag": etag, "X-Cache": "MISS" if hit is None else "HIT"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+# -----------------------------
+# Object store (Concept / SceneDraft → 이후 단계에서 id로 참조)
+# -----------------------------
+STORE_MAX_ITEMS = int(os.getenv("STORE_MAX_ITEMS", "5000"))
+STORE_TTL_SEC = float(os.getenv("STORE_TTL_SEC", "3600"))
+STORE_SQLITE_PATH = os.getenv("STORE_SQLITE_PATH", "").strip()
+STORE_BULK_MAX_ITEMS = int(os.getenv("STORE_BULK_MAX_ITEMS", "1000"))
+STORE_BULK_TTL_SEC = float(os.getenv("STORE_BULK_TTL_SEC", "600"))
+
+class _ObjectStore:
+    """메모리 LRU + TTL, STORE_SQLITE_PATH가 있으면 SQLite로 write-behind (메모리 miss 시 승격).
+
+    SQLite 쓰기는 요청 경로에서 하지 않는다: put은 pending에만 넣고, writer thread가 쌓인 것을 트랜잭션 한 번에.
+    Concept.id는 _slug(title)-code 라서 같은 제목의 다른 앨범과 겹치면 마지막 것이 이긴다.
+    """
+
+    _MODELS = {"concept": Concept, "scene": SceneDraft}
+
+    def __init__(self, max_items: int, ttl: float, sqlite_path: str = "", bulk_max_items: int = 1000,
+                 bulk_ttl: float = 600.0):
+        self.max_items = max_items
+        self.ttl = ttl
+        self.bulk_max_items = bulk_max_items
+        self.bulk_ttl = bulk_ttl
+        self._d: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._bulk: "OrderedDict[tuple, tuple]" = OrderedDict()   # pipeline batch 같은 대량 생성분
+        self._lock = threading.Lock()
+        self._db = None
+        self._writes = 0
+        self.hits = self.misses = self.evictions = self.db_hits = 0
+        self.flushes = 0
+        self.sqlite_path = sqlite_path
+        self.recording: Optional[list] = None   # process worker: put을 부모로 돌려보낼 기록으로만
+        self._tap = threading.local()           # capture(): 이 thread의 put을 호출자 list에도
+        self._init_writer()
+        if sqlite_path:
+            self._connect()
+
+    def _init_writer(self):
+        self._pending: Dict[tuple, tuple] = {}   # (kind, id) → (obj | raw, expires), 아직 SQLite에 안 쓴 것
+        self._wake = threading.Condition(self._lock)
+        self._writer: Optional[threading.Thread] = None
+        self._inflight: Dict[tuple, tuple] = {}   # writer가 지금 쓰고 있는 batch
+        self._seq = self._committed = 0           # enqueue 번호 / commit 된 마지막 번호
+        self._waiters: List[tuple] = []           # (seq, loop, future): synced()가 기다리는 중
+
+    def _connect(self):
+        self._db = sqlite3.connect(self.sqlite_path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS objects (kind TEXT, id TEXT, body TEXT, expires REAL, PRIMARY KEY (kind, id))"
+        )
+        self._db_lock = threading.Lock()   # 연결은 writer thread와 get()이 같이 쓴다
+
+    def after_fork(self):
+        # 부모의 SQLite 연결/락/writer thread를 fork된 자식이 같이 쓰면 안 된다 (serve.py preload, search pool)
+        self._lock = threading.Lock()
+        self._init_writer()
+        if self.sqlite_path:
+            self._connect()
+
+    def _remember(self, key: tuple, obj, expires: float, bulk: bool = False):
+        d, cap = (self._bulk, self.bulk_max_items) if bulk else (self._d, self.max_items)
+        d[key] = (obj, expires)
+        d.move_to_end(key)
+        while len(d) > cap:
+            d.popitem(last=False)
+            self.evictions += 1
+
+    def _enqueue(self, key: tuple, obj, expires: float):
+        # _lock 안에서. 같은 key는 마지막 것만 쓴다
+        self._pending[key] = (obj, expires)
+        self._seq += 1
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop, name="store-writer", daemon=True)
+            self._writer.start()
+        self._wake.notify()
+
+    def _put(self, kind: str, obj_id: str, obj, bulk: Optional[bool]):
+        if bulk is None:
+            bulk = getattr(self._tap, "bulk", False)
+        if self.recording is not None:
+            self.recording.append((kind, obj_id, obj, bulk))
+            return
+        tap = getattr(self._tap, "puts", None)
+        if tap is not None:
+            tap.append((kind, obj_id, obj, bulk))
+        expires = time.time() + (self.bulk_ttl if bulk else self.ttl)
+        with self._lock:
+            self._remember((kind, obj_id), obj, expires, bulk)
+            if self._db is not None:
+                self._enqueue((kind, obj_id), obj, expires)
+
+    def put(self, kind: str, obj_id: str, obj, bulk: Optional[bool] = None):
+        """bulk: 별도 LRU/TTL 구역 (None이면 capture(bulk=...)를 따른다)."""
+        self._put(kind, obj_id, obj, bulk)
+
+    def put_raw(self, kind: str, obj_id: str, raw: bytes, bulk: Optional[bool] = None):
+        """이미 직렬화된 객체 (process worker가 만든 것). 모델 검증은 처음 get 할 때."""
+        self._put(kind, obj_id, raw, bulk)
+
+    def restore(self, puts) -> None:
+        """응답 캐시 HIT: capture()로 받아 둔 (kind, id, obj | raw, bulk) 중 메모리에서 빠진 것만 메모리에 다시 넣는다.
+        SQLite에는 miss 때 이미 썼고 응답 캐시 TTL ≤ store TTL 이라 그 행이 아직 살아 있으므로 다시 쓰지 않는다."""
+        if not puts:
+            return
+        now = time.time()
+        with self._lock:
+            for kind, obj_id, obj, bulk in puts:
+                key = (kind, obj_id)
+                d = self._bulk if bulk else self._d
+                entry = d.get(key)
+                if entry is not None and entry[1] >= now:
+                    d.move_to_end(key)
+                else:
+                    self._remember(key, obj, now + (self.bulk_ttl if bulk else self.ttl), bulk)
+
+    def capture(self, fn, *args, puts: Optional[list] = None, bulk: bool = False):
+        """fn(*args)를 돌리는 동안 이 thread의 put을 puts에도 적는다 (None이면 바깥 capture의 list 그대로).
+        bulk=True: 그동안의 put은 bulk 구역으로 (batch가 interactive ref를 LRU에서 밀어내지 않게)."""
+        tap = self._tap
+        prev = getattr(tap, "puts", None), getattr(tap, "bulk", False)
+        tap.puts = prev[0] if puts is None else puts
+        tap.bulk = prev[1] or bulk
+        try:
+            return fn(*args)
+        finally:
+            tap.puts, tap.bulk = prev
+
+    def _write_loop(self):
+        while True:
+            with self._lock:
+                while not self._pending:
+                    self._wake.wait()
+                batch, self._pending = self._pending, {}
+                self._inflight = batch
+                upto = self._seq
+            rows = [(kind, obj_id, (obj if isinstance(obj, bytes) else _dump_json(obj)).decode(), expires)
+                    for (kind, obj_id), (obj, expires) in batch.items()]
+            try:
+                self._write(rows)
+            except Exception:
+                logging.getLogger("uvicorn.error").exception("object store: %d writes lost", len(rows))
+            finally:
+                with self._lock:
+                    self._inflight = {}
+                    self._committed = upto
+                    ready = [w for w in self._waiters if w[0] <= upto]
+                    self._waiters = [w for w in self._waiters if w[0] > upto]
+                for _, loop, fut in ready:
+                    loop.call_soon_threadsafe(_resolve_future, fut)
+
+    def _write(self, rows: List[tuple]):
+        with self._db_lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.executemany("INSERT OR REPLACE INTO objects VALUES (?, ?, ?, ?)", rows)
+                before = self._writes
+                self._writes += len(rows)
+                if self._writes // 1000 != before // 1000:
+                    self._db.execute("DELETE FROM objects WHERE expires < ?", (time.time(),))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        self.flushes += 1
+
+    async def synced(self):
+        """지금까지 enqueue 된 쓰기가 SQLite에 commit 될 때까지 (응답 전에: 다른 worker가 받은 ref도 찾게).
+        writer가 모아서 한 트랜잭션으로 쓰므로 동시에 기다리는 요청들은 commit 한 번을 같이 기다린다."""
+        if self._db is None:
+            return
+        with self._lock:
+            if self._committed >= self._seq:
+                return
+            loop = asyncio.get_running_loop()
+            fut = loop.create_future()
+            self._waiters.append((self._seq, loop, fut))
+        await fut
+
+    def flush(self, timeout: float = 5.0):
+        """shutdown 전: pending이 SQLite에 들어갈 때까지 (최대 timeout초) 기다린다."""
+        deadline = time.monotonic() + timeout
+        while self._db is not None and time.monotonic() < deadline:
+            with self._lock:
+                if not self._pending and not self._inflight:
+                    return
+            time.sleep(0.01)
+
+    def get(self, kind: str, obj_id: str):
+        now = time.time()
+        key = (kind, obj_id)
+        with self._lock:
+            for d in (self._d, self._bulk):
+                entry = d.get(key)
+                if entry is not None and entry[1] >= now:
+                    d.move_to_end(key)
+                    self.hits += 1
+                    if isinstance(entry[0], bytes):
+                        obj = self._MODELS[kind].model_validate_json(entry[0])
+                        d[key] = (obj, entry[1])
+                        return obj
+                    return entry[0]
+                if entry is not None:
+                    del d[key]
+            if self._db is None:
+                self.misses += 1
+                return None
+            # 메모리에선 밀려났지만 아직 SQLite에 안 들어간 것
+            pending = self._pending.get(key) or self._inflight.get(key)
+        if pending is not None and pending[1] >= now:
+            body, expires = pending
+        else:
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT body, expires FROM objects WHERE kind = ? AND id = ? AND expires >= ?", (kind, obj_id, now)
+                ).fetchone()
+            if row is None:
+                with self._lock:
+                    self.misses += 1
+                return None
+            body, expires = row
+        obj = body if isinstance(body, BaseModel) else self._MODELS[kind].model_validate_json(body)
+        with self._lock:
+            self._remember(key, obj, expires)
+            self.db_hits += 1
+        return obj
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "items": len(self._d), "max_items": self.max_items, "ttl_sec": self.ttl, "sqlite": bool(self._db),
+            "bulk_items": len(self._bulk), "bulk_max_items": self.bulk_max_items, "bulk_ttl_sec": self.bulk_ttl,
+            "pending_writes": len(self._pending), "flushes": self.flushes,
+            "hits": self.hits, "db_hits": self.db_hits, "misses": self.misses, "evictions": self.evictions,
+        }
+
+def _resolve_future(fut: asyncio.Future):
+    if not fut.done():
+        fut.set_result(None)
+
+_STORE = _ObjectStore(STORE_MAX_ITEMS, STORE_TTL_SEC, STORE_SQLITE_PATH, STORE_BULK_MAX_ITEMS, STORE_BULK_TTL_SEC)
+os.register_at_fork(after_in_child=_STORE.after_fork)
+# 캐시 HIT은 store.restore()로 메모리만 채운다 → 캐시 항목이 miss 때 쓴 SQLite 행보다 오래 살면 안 된다
+_RESP_CACHE.ttl = min(_RESP_CACHE.ttl, STORE_TTL_SEC)
+
+def _scene_id(scene: SceneDraft) -> str:
+    return "sc-" + hashlib.sha256(_dump_json(scene)).hexdigest()[:16]
+
+def _lookup(kind: str, ref: str, local=None):
+    obj = local.get(kind, ref) if local is not None else None
+    if obj is None:
+        obj = _STORE.get(kind, ref)
+    if obj is None:
+        raise HTTPException(status_code=404, detail=f"unknown {kind} ref '{ref}' (expired?) — resend it inline")
+    return obj
+
+def _resolved(payload, local=None):
+    """selection_ref / scene_ref 를 실제 객체로 바꾼 사본 (캐시 키도 inline 요청과 같아진다).
+
+    local: get(kind, ref)를 가진 세션 상태 (/ws) — 전역 store보다 먼저 본다.
+    """
+    if getattr(payload, "selection_ref", None) and payload.selection is None:
+        sel = _lookup("concept", payload.selection_ref, local)
+        return payload.model_copy(update={"selection": sel, "selection_ref": None})
+    if getattr(payload, "scene_ref", None) and payload.scene is None:
+        return payload.model_copy(update={"scene": _lookup("scene", payload.scene_ref, local), "scene_ref": None})
+    return payload
+
+# -----------------------------
+# Prompt templates (시작 시 한 번 컴파일, 엔진별 renderer 등록)
+# -----------------------------
+class _Template:
+    """str.format 문법의 {name} 필드만 지원. 한 번 파싱해 (literal, field) 조각으로 들고 있다."""
+
+    __slots__ = ("text", "parts", "fields")
+
+    def __init__(self, text: str):
+        self.text = text
+        parts = []
+        for literal, field, spec, conv in string.Formatter().parse(text):
+            if spec or conv:
+                raise ValueError(f"format spec/conversion not supported in template field '{field}'")
+            parts.append((literal, field))
+        self.parts = tuple(parts)
+        self.fields = frozenset(f for _, f in parts if f)
+
+    def render(self, values: Dict[str, str]) -> str:
+        return "".join([lit + values[f] if f else lit for lit, f in self.parts])
+
+class _EngineRenderer:
+    __slots__ = ("name", "draft_key", "draft", "block", "vars")
+
+    def __init__(self, name: str, draft: str, block: str, draft_key: Optional[str] = None, **vars: str):
+        self.name = name
+        self.draft_key = draft_key or name.lower()
+        self.draft = _Template(draft)
+        self.block = _Template(block)
+        self.vars = {"engine": name, **vars}
+
+    def render_draft(self, shared: Dict[str, str]) -> str:
+        return self.draft.render({**shared, **self.vars})
+
+    def render_block(self, scene: SceneDraft) -> str:
+        st, ds = scene.st, scene.ds
+        return self.block.render({
+            **self.vars,
+            "framing": str(st.framing), "lens_mm": str(st.lens_mm),
+            "dof": str(st.dof), "ar": str(st.ar),
+            "primary_action": str(ds.primary_action), "camera_move": str(ds.camera_move),
+            "timeline": _timeline_text(scene.timeline),
+            "lighting": ", ".join(st.base_lighting or ()),
+        })
+
+DRAFT_TEMPLATE = (
+    "{framing}, {lens}, {dof}; one camera move: {camera_move}; subject: two 20s friends; "
+    "background: {background}; action: hot pack handoff in a single beat; "
+    "palette: {palette}; timeline: {timeline}; positives only; no clones; no watermark;"
+)
+BLOCK_TEMPLATE = (
+    "[BEGIN EngineRender {engine}]\n"
+    "framing: {framing}; lens: {lens_mm}mm; DOF: {dof}; AR: {ar}\n"
+    "subject: two friends (20s), key prop: hot pack; background: winter street evening\n"
+    "action: {primary_action} (one beat); camera_move: {camera_move}\n"
+    "timeline: {timeline}\n"
+    "lighting: {lighting}. palette: muted warm neutrals.\n"
+    "safety: no clones; no watermark; penetration ≤ 0.2 cm; single camera move; focal locked.\n"
+    "\n[END EngineRender {engine}]"
+)
+STILL_TEMPLATE = _Template(
+    "{label}, {style} look, natural skin texture, {dof}, {lens}, one camera move: {move}; "
+    "palette: {palette}; lighting: {lighting}; "
+    "wardrobe: muted casual; texture: subtle grain; no watermark; --ar 16:9"
+)
+
+_ENGINES: Dict[str, _EngineRenderer] = {}
+
+def register_engine(name: str, draft: str = DRAFT_TEMPLATE, block: str = BLOCK_TEMPLATE, **vars: str) -> _EngineRenderer:
+    """엔진 추가: expandScene drafts[draft_key]와 qaValidate engine=<name>에 바로 반영된다."""
+    renderer = _EngineRenderer(name, draft, block, **vars)
+    _ENGINES[name] = renderer
+    _RESP_CACHE.clear()
+    return renderer
+
+register_engine("SORA", background="winter street evening")
+register_engine("VEO", background="city plaza dusk")
+
+def _engine(name: str) -> _EngineRenderer:
+    renderer = _ENGINES.get(name)
+    if renderer is None:
+        raise HTTPException(status_code=422, detail=f"unknown engine '{name}' (registered: {', '.join(_ENGINES)})")
+    return renderer
+
+@functools.lru_cache(maxsize=4096)
+def _joined(items: tuple) -> str:
+    return ", ".join(items)
+
+def _timeline_text(timeline: List[TimelineBeat]) -> str:
+    return ", ".join([f"{b.t:.1f}s {b.beat}" for b in timeline])
+
+def _render_drafts(shared: Dict[str, str]) -> Dict[str, str]:
+    # 공통 조각(palette/timeline 등)은 한 번만 만들고 등록된 모든 엔진 draft를 한 번에
+    return {r.draft_key: r.render_draft(shared) for r in _ENGINES.values()}
+
+# -----------------------------
+# Core logic (엔드포인트/배치가 공유)
+# -----------------------------
+CONCEPT_FLAVORS = (
+    ("A", "intimate, handheld realism"),
+    ("B", "stylized, composed frames"),
+    ("C", "kinetic, rhythmic cutting"),
+    ("D", "graphic, silhouette-driven"),
+    ("E", "dreamy, soft diffusion"),
+    ("F", "contrasty, neon noir"),
+)
+
+def _derive_concepts_core(payload: DeriveConceptsRequest) -> DeriveConceptsResponse:
     info = payload.album_info
     controls = payload.controls or Controls()
 
     text = f"{info.style} {info.lyrics}"
-    palette = controls.palette_override or _pick_palette(text)
-    lighting = controls.lighting_override or _lighting_for_style(text)
+    lex_palette, lex_lighting = _LEXICON.select(text)   # 한 번 훑어서 둘 다
+    palette = controls.palette_override or lex_palette
+    lighting = controls.lighting_override or lex_lighting
 
     base_id = _slug(info.title or "concept")
     concepts: List[Concept] = []
 
-    base_variants = [
-        ("A", "intimate, handheld realism"),
-        ("B", "stylized, composed frames"),
-        ("C", "kinetic, rhythmic cutting"),
-        ("D", "graphic, silhouette-driven"),
-        ("E", "dreamy, soft diffusion"),
-        ("F", "contrasty, neon noir"),
-    ]
+    base_variants = CONCEPT_FLAVORS
     for code, flavor in base_variants[:controls.variants]:
         concepts.append(
             Concept(
@@ -130,30 +678,34 @@ def derive_concepts(payload: DeriveConceptsRequest, _: bool = Security(require_b
             )
         )
 
+    for c in concepts:
+        _STORE.put("concept", c.id, c)
     return DeriveConceptsResponse(concepts=concepts)
 
-@app.post("/compose-stills", operation_id="composeStills", response_model=ComposeStillsResponse)
-def compose_stills(payload: ComposeStillsRequest, _: bool = Security(require_bearer)):
+STILL_FRAMES = (
+    ("wide establishing", "24 mm", "deep DOF", "fixed camera"),
+    ("medium portrait", "85 mm", "shallow DOF", "slow push-in"),
+    ("detail/insert", "50 mm", "macro-ish DOF", "fixed camera"),
+    ("over-the-shoulder", "50 mm", "shallow DOF", "pan left"),
+    ("profile two-shot", "35 mm", "medium DOF", "tilt up"),
+    ("cutaway prop", "70 mm", "shallow DOF", "fixed camera"),
+)
+
+def _compose_stills_core(payload: ComposeStillsRequest) -> ComposeStillsResponse:
     sel = payload.selection
     count = payload.count
 
-    frames = [
-        ("wide establishing", "24 mm", "deep DOF", "fixed camera"),
-        ("medium portrait", "85 mm", "shallow DOF", "slow push-in"),
-        ("detail/insert", "50 mm", "macro-ish DOF", "fixed camera"),
-        ("over-the-shoulder", "50 mm", "shallow DOF", "pan left"),
-        ("profile two-shot", "35 mm", "medium DOF", "tilt up"),
-        ("cutaway prop", "70 mm", "shallow DOF", "fixed camera"),
-    ]
+    frames = STILL_FRAMES
 
+    shared = {
+        "style": sel.style,
+        "palette": _joined(tuple(sel.anchors.get("palette", []))),
+        "lighting": _joined(tuple(sel.anchors.get("lighting", []))),
+    }
     stills: List[MJPrompt] = []
     for i in range(min(count, len(frames))):
         label, lens, dof, move = frames[i]
-        prompt = (
-            f"{label}, {sel.style} look, natural skin texture, {dof}, {lens}, one camera move: {move}; "
-            f"palette: {', '.join(sel.anchors.get('palette', []))}; lighting: {', '.join(sel.anchors.get('lighting', []))}; "
-            f"wardrobe: muted casual; texture: subtle grain; no watermark; --ar 16:9"
-        )
+        prompt = STILL_TEMPLATE.render({**shared, "label": label, "lens": lens, "dof": dof, "move": move})
         stills.append(
             MJPrompt(
                 id=f"mj-{i+1}",
@@ -165,64 +717,70 @@ def compose_stills(payload: ComposeStillsRequest, _: bool = Security(require_bea
 
     return ComposeStillsResponse(stills=stills)
 
-@app.post("/expand-scene", operation_id="expandScene", response_model=ExpandSceneResponse)
-def expand_scene(payload: ExpandSceneRequest, _: bool = Security(require_bearer)):
-    sel = payload.selection
-    duration = float(payload.duration_sec)
-    beats_n = int(payload.beats)
+BASE_BEATS = (
+    "hold eye contact",
+    "hands rise",
+    "handoff contact",
+    "settle (grip ~0.2s)",
+    "micro smile + exhale",
+)
+INTENSITY_SEQ = (0.3, 0.5, 0.9, 0.6, 0.4)
 
+def _scene_foundations(sel: Concept):
     # ST: static foundations
-    st = {
-        "ar": "16:9",
-        "framing": "medium shot, eye-level",
-        "lens_mm": 85,
-        "dof": "shallow",
-        "base_lighting": sel.anchors.get("lighting", ["soft key", "gentle fill", "rim"]),
-    }
+    st = SceneST(
+        ar="16:9",
+        framing="medium shot, eye-level",
+        lens_mm=85,
+        dof="shallow",
+        base_lighting=sel.anchors.get("lighting", ["soft key", "gentle fill", "rim"]),
+    )
 
     # DS: dynamic-strong (single primary action + one camera move)
-    ds = {
-        "primary_action": "hot pack handoff (one clean beat)",
-        "camera_move": "slow push-in",
-        "focus_transition": "rack to hands then back to eyes",
-        "lighting_event": "subtle warm shift at contact (DS7)",
-    }
+    ds = SceneDS(
+        primary_action="hot pack handoff (one clean beat)",
+        camera_move="slow push-in",
+        focus_transition="rack to hands then back to eyes",
+        lighting_event="subtle warm shift at contact (DS7)",
+    )
 
     # DW: dynamic-weak (ambient)
-    dw = {
-        "micro_vfx": "soft breath in cold air",
-        "ambient": "light crowd bokeh wobble",
-    }
+    dw = SceneDW(
+        micro_vfx="soft breath in cold air",
+        ambient="light crowd bokeh wobble",
+    )
+    return st, ds, dw
+
+def _assemble_scene(sel: Concept, st: SceneST, ds: SceneDS, dw: SceneDW, timeline: List[TimelineBeat]) -> SceneDraft:
+    drafts = _render_drafts({
+        "framing": st.framing, "lens": f"{st.lens_mm}mm", "dof": f"{st.dof} DOF",
+        "camera_move": ds.camera_move,
+        "palette": _joined(tuple(sel.anchors.get("palette", []))),
+        "timeline": _timeline_text(timeline),
+    })
+    return SceneDraft(st=st, ds=ds, dw=dw, timeline=timeline, drafts=drafts)
 
-    base_beats = [
-        "hold eye contact",
-        "hands rise",
-        "handoff contact",
-        "settle (grip ~0.2s)",
-        "micro smile + exhale",
-    ]
-    beats_txt = base_beats[:beats_n] if beats_n <= len(base_beats) else base_beats + [f"beat {i}" for i in range(len(base_beats)+1, beats_n+1)]
+def _build_timeline(beats_n: int, duration: float) -> List[TimelineBeat]:
+    beats_txt = list(BASE_BEATS[:beats_n]) if beats_n <= len(BASE_BEATS) else list(BASE_BEATS) + [f"beat {i}" for i in range(len(BASE_BEATS)+1, beats_n+1)]
 
     timeline: List[TimelineBeat] = []
     for i, bt in enumerate(beats_txt):
         t = 0.0 if beats_n == 1 else (duration * i / (beats_n - 1))
-        intensity_seq = [0.3, 0.5, 0.9, 0.6, 0.4]
-        intensity = float(intensity_seq[i] if i < len(intensity_seq) else 0.5)
+        intensity = float(INTENSITY_SEQ[i] if i < len(INTENSITY_SEQ) else 0.5)
         timeline.append(TimelineBeat(t=round(t, 2), beat=bt, intensity=intensity))
+    return timeline
 
-    timeline_str = ", ".join([f"{b.t:.1f}s {b.beat}" for b in timeline])
-
-    sora_draft = (
-        "medium shot, eye-level, 85mm, shallow DOF; one camera move: slow push-in; subject: two 20s friends; "
-        "background: winter street evening; action: hot pack handoff in a single beat; "
-        f"palette: {', '.join(sel.anchors.get('palette', []))}; "
-        f"timeline: {timeline_str}; "
-        "positives only; no clones; no watermark;"
-    )
-    veo_draft = sora_draft.replace("winter street evening", "city plaza dusk")
+def _expand_scene_core(payload: ExpandSceneRequest) -> ExpandSceneResponse:
+    sel = payload.selection
+    duration = float(payload.duration_sec)
+    beats_n = int(payload.beats)
 
-    scene = SceneDraft(st=st, ds=ds, dw=dw, timeline=timeline, drafts={"sora": sora_draft, "veo": veo_draft})
-    return ExpandSceneResponse(scene=scene)
+    st, ds, dw = _scene_foundations(sel)
+    timeline = _build_timeline(beats_n, duration)
+    scene = _assemble_scene(sel, st, ds, dw, timeline)
+    scene_id = _scene_id(scene)
+    _STORE.put("scene", scene_id, scene)
+    return ExpandSceneResponse(scene=scene, scene_id=scene_id)
 
 # -----------------------------
 # QA & Finalization
@@ -236,46 +794,207 @@ HARD_CONFLICTS = {
     "digital_crop": "DigitalCropInShot > 10%",
 }
 
-def _keyword_score(brief: str, draft: str) -> float:
-    words = set(re.findall(r"[a-zA-Z]+", brief.lower()))
+# ---- story match: 토큰화는 텍스트마다 한 번 (cache), 점수는 set 연산 ----
+# brief 단어 w 가 draft.lower() 안에 substring으로 있으면 hit. w 는 알파벳뿐이라 draft의 알파벳 토큰 하나 안에
+# 들어 있을 때만 그렇다 → 토큰 set 교집합으로 먼저 세고, 남은 단어만 토큰을 이은 문자열에서 찾는다 (st ⊂ street).
+_ALPHA_RE = re.compile(r"[a-z]+")
+
+@functools.lru_cache(maxsize=8192)
+def _text_words(text: str) -> frozenset:
+    return frozenset(_ALPHA_RE.findall(text.lower()))
+
+class _TokenIndex:
+    __slots__ = ("tokens", "joined")
+
+    def __init__(self, draft: str):
+        self.tokens = _text_words(draft)
+        self.joined = "\0".join(self.tokens)
+
+    def hits(self, words: frozenset) -> int:
+        exact = words & self.tokens
+        if len(exact) == len(words):
+            return len(exact)
+        joined = self.joined
+        return len(exact) + sum(1 for w in words - exact if w in joined)
+
+@functools.lru_cache(maxsize=4096)
+def _draft_index(draft: str) -> _TokenIndex:
+    return _TokenIndex(draft)
+
+def _match_score(words: frozenset, index: _TokenIndex) -> float:
     if not words:
         return 0.7
-    hits = sum(1 for w in words if w in draft.lower())
-    return min(1.0, 0.5 + 0.5 * (hits / max(1, len(words))))
+    return min(1.0, 0.5 + 0.5 * (index.hits(words) / len(words)))
 
 def _coverage_score(scene: SceneDraft) -> float:
     have = 0
     total = 6
-    have += 1 if scene.st.get("ar") == "16:9" else 0
-    have += 1 if scene.st.get("lens_mm") else 0
-    have += 1 if scene.ds.get("primary_action") else 0
-    have += 1 if scene.ds.get("camera_move") else 0
+    st, ds = scene.st, scene.ds
+    have += 1 if st.ar == "16:9" else 0
+    have += 1 if st.lens_mm else 0
+    have += 1 if ds.primary_action else 0
+    have += 1 if ds.camera_move else 0
     have += 1 if scene.timeline else 0
-    have += 1 if scene.dw.get("micro_vfx") else 0
+    have += 1 if scene.dw.micro_vfx else 0
     return have / total
 
-def _detect_conflicts(scene: SceneDraft) -> List[str]:
-    conflicts = []
-    if scene.st.get("ar") != "16:9":
-        conflicts.append(HARD_CONFLICTS["ar_lock_missing"])
-
-    cm = scene.ds.get("camera_move", "")
-    if any(k in cm for k in ["&", ",", "+"]):
-        conflicts.append(HARD_CONFLICTS["multi_camera_moves"])
-
-    if re.search(r"rain|snow|storm", json.dumps(scene.dw), re.I) and re.search(r"flash|strobe|intense", json.dumps(scene.ds), re.I):
-        conflicts.append(HARD_CONFLICTS["weather_vfx_double_strong"])
-
-    if scene.ds.get("penetration_mm", 0) and scene.ds.get("penetration_mm", 0) > 2.0:
-        conflicts.append(HARD_CONFLICTS["penetration_limit"])
-
-    if not isinstance(scene.st.get("lens_mm"), (int, float)):
-        conflicts.append(HARD_CONFLICTS["focal_not_locked"])
+# ---- Conflict rules: 선언형 테이블 → 시작 시 한 번 컴파일 ----
+# when: {"path": "st.ar", "op": ..., "value": ...} | {"all": [...]} | {"any": [...]} | {"not": {...}}
+# op: eq, ne, gt, ge, lt, le, contains_any, not_number, regex (path 아래 모든 키/값 텍스트 검색)
+DEFAULT_QA_RULES: List[Dict[str, Any]] = [
+    {"id": "ar_lock_missing", "when": {"path": "st.ar", "op": "ne", "value": "16:9"}},
+    {"id": "multi_camera_moves", "when": {"path": "ds.camera_move", "op": "contains_any", "value": ["&", ",", "+"]}},
+    {"id": "weather_vfx_double_strong", "when": {"all": [
+        {"path": "dw", "op": "regex", "value": "rain|snow|storm", "flags": "i"},
+        {"path": "ds", "op": "regex", "value": "flash|strobe|intense", "flags": "i"},
+    ]}},
+    {"id": "penetration_limit", "when": {"path": "ds.penetration_mm", "op": "gt", "value": 2.0}},
+    {"id": "focal_not_locked", "when": {"path": "st.lens_mm", "op": "not_number"}},
+    {"id": "digital_crop", "when": {"path": "st.digital_crop_pct", "op": "gt", "value": 10}},
+]
+
+_MISSING = object()
+_NUM = (int, float)
+_CMP_OPS = {
+    "gt": lambda a, b: a > b,
+    "ge": lambda a, b: a >= b,
+    "lt": lambda a, b: a < b,
+    "le": lambda a, b: a <= b,
+}
 
-    if scene.st.get("digital_crop_pct") and scene.st.get("digital_crop_pct") > 10:
-        conflicts.append(HARD_CONFLICTS["digital_crop"])
+def _path_getter(path: str):
+    root, *rest = path.split(".")
+    def get(scene):
+        cur = getattr(scene, root, _MISSING)
+        for key in rest:
+            if isinstance(cur, BaseModel):
+                # 선언 필드의 None은 예전 dict에서 키가 없던 것과 같다; extra 키도 getattr로 닿는다
+                cur = getattr(cur, key, None)
+                if cur is None:
+                    return _MISSING
+            elif isinstance(cur, dict):
+                cur = cur.get(key, _MISSING)
+            else:
+                return _MISSING
+        return cur
+    return get
+
+def _model_items(node: BaseModel):
+    for k, v in node.__dict__.items():
+        if v is not None:
+            yield k, v
+    if node.__pydantic_extra__:
+        yield from node.__pydantic_extra__.items()
+
+def _iter_text(node, keys: bool = True):
+    # json.dumps 없이 키/값을 그대로 훑는다 (keys=False: 값만)
+    if isinstance(node, BaseModel):
+        node = dict(_model_items(node))
+    if isinstance(node, dict):
+        for k, v in node.items():
+            if keys:
+                yield str(k)
+            yield from _iter_text(v, keys)
+    elif isinstance(node, (list, tuple)):
+        for v in node:
+            yield from _iter_text(v, keys)
+    elif isinstance(node, str):
+        yield node
+    elif node is not None and node is not _MISSING:
+        yield str(node)
+
+def _compile_condition(cond: Dict[str, Any]):
+    for combinator, agg in (("all", all), ("any", any)):
+        if combinator in cond:
+            parts = [_compile_condition(c) for c in cond[combinator]]
+            return lambda scene, ctx: agg(p(scene, ctx) for p in parts)
+    if "not" in cond:
+        inner = _compile_condition(cond["not"])
+        return lambda scene, ctx: not inner(scene, ctx)
+
+    path, op, value = cond["path"], cond["op"], cond.get("value")
+    get = _path_getter(path)
+    if op == "eq":
+        return lambda scene, ctx: (None if (v := get(scene)) is _MISSING else v) == value
+    if op == "ne":
+        return lambda scene, ctx: (None if (v := get(scene)) is _MISSING else v) != value
+    if op in _CMP_OPS:
+        cmp = _CMP_OPS[op]
+        return lambda scene, ctx: isinstance(v := get(scene), _NUM) and cmp(v, value)
+    if op == "contains_any":
+        needles = tuple(value)
+        return lambda scene, ctx: isinstance(v := get(scene), str) and any(k in v for k in needles)
+    if op == "not_number":
+        return lambda scene, ctx: not isinstance(get(scene), _NUM)
+    if op == "regex":
+        rx = re.compile(value, re.I if "i" in cond.get("flags", "") else 0)
+        def match(scene, ctx):
+            texts = ctx.get(path)
+            if texts is None:
+                texts = ctx[path] = tuple(_iter_text(get(scene)))
+            return any(rx.search(t) for t in texts)
+        return match
+    raise ValueError(f"unknown rule op: {op}")
+
+def _condition_paths(cond: Dict[str, Any]) -> tuple:
+    if "path" in cond:
+        return (cond["path"],)
+    subs = cond.get("all") or cond.get("any") or [cond["not"]]
+    return tuple(p for c in subs for p in _condition_paths(c))
+
+class _CompiledRule:
+    __slots__ = ("spec", "id", "message", "enabled", "test", "paths", "evals", "hits", "ns", "_lock")
+
+    def __init__(self, spec: Dict[str, Any]):
+        self.spec = spec   # fork가 아닌 process worker에 테이블을 그대로 넘길 때
+        self.id = spec["id"]
+        self.message = spec.get("message") or HARD_CONFLICTS.get(self.id, self.id)
+        self.enabled = bool(spec.get("enabled", True))
+        self.test = _compile_condition(spec["when"])
+        self.paths = _condition_paths(spec["when"])
+        self.evals = self.hits = self.ns = 0
+        self._lock = threading.Lock()   # thread lane 여러 개가 같은 rule을 동시에 돈다
+
+    def __call__(self, scene, ctx) -> bool:
+        t0 = time.perf_counter_ns()
+        hit = self.test(scene, ctx)
+        ns = time.perf_counter_ns() - t0
+        with self._lock:
+            self.ns += ns
+            self.evals += 1
+            if hit:
+                self.hits += 1
+        return hit
+
+def _load_qa_rules(specs: Optional[List[Dict[str, Any]]] = None) -> tuple:
+    if specs is None:
+        path = os.getenv("QA_RULES_PATH", "").strip()
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            specs = data["rules"] if isinstance(data, dict) else data
+        else:
+            specs = DEFAULT_QA_RULES
+    disabled = {x.strip() for x in os.getenv("QA_RULES_DISABLED", "").split(",") if x.strip()}
+    rules = tuple(_CompiledRule(s) for s in specs)
+    for r in rules:
+        if r.id in disabled:
+            r.enabled = False
+    return rules
+
+_QA_RULES = _load_qa_rules()
+_QA_RULES_VERSION = 0   # /__qa_rules 가 테이블을 바꾸거나 on/off 할 때마다 +1 (QA state 무효화, process pool 재생성 기준)
+
+def _qa_rules_stats() -> List[Dict[str, Any]]:
+    return [
+        {"id": r.id, "message": r.message, "enabled": r.enabled, "evals": r.evals, "hits": r.hits,
+         "total_ms": round(r.ns / 1e6, 3), "avg_us": round(r.ns / r.evals / 1e3, 2) if r.evals else 0.0}
+        for r in _QA_RULES
+    ]
 
-    return conflicts
+def _detect_conflicts(scene: SceneDraft) -> List[str]:
+    ctx: Dict[str, Any] = {}
+    return [rule.message for rule in _QA_RULES if rule.enabled and rule(scene, ctx)]
 
 def _severity(story_match: float, coverage: float, conflicts: List[str]) -> Literal["info", "warn", "fail"]:
     if story_match < 0.60 or coverage < 0.70 or conflicts:
@@ -285,55 +1004,1329 @@ def _severity(story_match: float, coverage: float, conflicts: List[str]) -> Lite
     return "info"
 
 def _render_engine_block(engine: str, scene: SceneDraft) -> str:
-    header = f"[BEGIN EngineRender {engine}]"
-    footer = f"[END EngineRender {engine}]"
-    body = (
-        f"framing: {scene.st.get('framing')}; lens: {scene.st.get('lens_mm')}mm; DOF: {scene.st.get('dof')}; AR: {scene.st.get('ar')}\n"
-        f"subject: two friends (20s), key prop: hot pack; background: winter street evening\n"
-        f"action: {scene.ds.get('primary_action')} (one beat); camera_move: {scene.ds.get('camera_move')}\n"
-        f"timeline: {', '.join([f'{b.t:.1f}s {b.beat}' for b in scene.timeline])}\n"
-        f"lighting: " + ", ".join(scene.st.get('base_lighting', [])) + ". palette: muted warm neutrals.\n"
-        f"safety: no clones; no watermark; penetration ≤ 0.2 cm; single camera move; focal locked.\n"
-    )
-    return "\n".join([header, body, footer])
+    return _engine(engine).render_block(scene)
 
 @app.post("/qa-validate", operation_id="qaValidate", response_model=QAValidateResponse)
-def qa_validate(payload: QAValidateRequest, _: bool = Security(require_bearer)):
+async def qa_validate(payload: QAValidateRequest, request: Request, _: bool = Security(require_bearer)):
+    return await _cached_json("qaValidate", _resolved(payload), request, _qa_validate_remembered)
+
+def _qa_validate_core(payload: QAValidateRequest, remember: bool = False) -> QAValidateResponse:
+    """remember=True (interactive /qa-validate만): QA state와 store에 남겨 base_ref로 쓸 수 있게.
+    stream / batch / ws 는 끄고 돈다 (대량 실행이 interactive LRU를 밀어내지 않도록)."""
     scene = payload.scene
     engine = payload.engine
+    checks = _qa_checks(scene, engine)
+    scene_hash = _scene_id(scene)
+    if remember:
+        _qa_state_put(scene_hash, engine, scene, checks)
+        _STORE.put("scene", scene_hash, scene)
+    return QAValidateResponse(engine_render=checks["engine_render"], report=_qa_report(checks), scene_hash=scene_hash)
+
+def _qa_validate_remembered(payload: QAValidateRequest) -> QAValidateResponse:
+    return _qa_validate_core(payload, remember=True)
+
+# ---- QA checks 단위 계산 (incremental 재검증용 의존 필드 포함) ----
+_QA_CHECK_DEPS: Dict[str, tuple] = {
+    "story_match": ("st", "ds", "drafts"),
+    "coverage": ("st.ar", "st.lens_mm", "ds.primary_action", "ds.camera_move", "timeline", "dw.micro_vfx"),
+    "engine_render": ("st.framing", "st.lens_mm", "st.dof", "st.ar", "st.base_lighting",
+                      "ds.primary_action", "ds.camera_move", "timeline"),
+}
 
-    story_match = _keyword_score(
-        brief=json.dumps({"st": scene.st, "ds": scene.ds}),
-        draft=scene.drafts.get("sora" if engine == "SORA" else "veo", ""),
+def _scene_brief(scene: SceneDraft) -> frozenset:
+    # st/ds 의 값만 (필드 이름 framing, lens_mm … 은 brief 단어가 아니다). anchor 문자열마다 토큰화는 cache
+    parts = []
+    for node in (scene.st, scene.ds):
+        for _, v in _model_items(node):
+            if isinstance(v, str):
+                parts.append(_text_words(v))
+            elif isinstance(v, list) and all(isinstance(x, str) for x in v):
+                parts.extend(map(_text_words, v))
+            else:
+                parts.extend(map(_text_words, _iter_text(v, keys=False)))
+    return frozenset().union(*parts)
+
+def _story_matches(scenes: List[SceneDraft], engine: str, brief: Optional[frozenset] = None) -> List[float]:
+    """scene 여러 개를 한 번에 (search chunk). draft는 index cache를 같이 쓰고, 같은 (brief, draft) 쌍은 한 번만.
+    brief: 모든 scene의 draft를 이 단어들에 대고 채점 (search의 요청 brief). 없으면 scene마다 자기 st/ds."""
+    key = _engine(engine).draft_key
+    scores: Dict[tuple, float] = {}
+    out = []
+    for scene in scenes:
+        pair = (_scene_brief(scene) if brief is None else brief, scene.drafts.get(key, ""))
+        score = scores.get(pair)
+        if score is None:
+            score = scores[pair] = _match_score(pair[0], _draft_index(pair[1]))
+        out.append(score)
+    return out
+
+def _qa_checks(scene: SceneDraft, engine: str, only: Optional[set] = None,
+               story_match: Optional[float] = None) -> Dict[str, Any]:
+    """check 이름 → 값. rule 결과는 "rule:<id>" → bool (비활성 rule은 빠진다). story_match: 미리 계산한 값."""
+    out: Dict[str, Any] = {}
+    if only is None or "story_match" in only:
+        if story_match is None:
+            draft = scene.drafts.get(_engine(engine).draft_key, "")
+            story_match = _match_score(_scene_brief(scene), _draft_index(draft))
+        out["story_match"] = story_match
+    if only is None or "coverage" in only:
+        out["coverage"] = _coverage_score(scene)
+    ctx: Dict[str, Any] = {}
+    for rule in _QA_RULES:
+        name = "rule:" + rule.id
+        if rule.enabled and (only is None or name in only):
+            out[name] = rule(scene, ctx)
+    if only is None or "engine_render" in only:
+        out["engine_render"] = _render_engine_block(engine, scene)
+    return out
+
+def _qa_report(checks: Dict[str, Any]) -> QAReport:
+    conflicts = [r.message for r in _QA_RULES if r.enabled and checks.get("rule:" + r.id)]
+    return QAReport(
+        story_match_score=round(checks["story_match"], 3),
+        coverage_score=round(checks["coverage"], 3),
+        conflicts=conflicts,
+        severity=_severity(checks["story_match"], checks["coverage"], conflicts),
     )
-    coverage = _coverage_score(scene)
-    conflicts = _detect_conflicts(scene)
-    sev = _severity(story_match, coverage, conflicts)
-
-    engine_render = _render_engine_block(engine, scene)
 
-    report = QAReport(
-        story_match_score=round(story_match, 3),
-        coverage_score=round(coverage, 3),
-        conflicts=conflicts,
-        severity=sev,
+def _dirty_checks(changed: List[str]) -> set:
+    def overlaps(a: str, b: str) -> bool:
+        return a == b or a.startswith(b + ".") or b.startswith(a + ".")
+    deps = dict(_QA_CHECK_DEPS)
+    deps.update({"rule:" + r.id: r.paths for r in _QA_RULES if r.enabled})
+    return {name for name, paths in deps.items() if any(overlaps(p, c) for p in paths for c in changed)}
+
+# ---- QA state (scene_hash, engine) → 직전 check 값 ----
+QA_STATE_MAX_ITEMS = int(os.getenv("QA_STATE_MAX_ITEMS", "2000"))
+_QA_STATE: "OrderedDict[tuple, tuple]" = OrderedDict()
+_QA_STATE_LOCK = threading.Lock()
+
+def _qa_state_put(scene_hash: str, engine: str, scene: SceneDraft, checks: Dict[str, Any]):
+    with _QA_STATE_LOCK:
+        _QA_STATE[(scene_hash, engine)] = (scene, _QA_RULES_VERSION, checks)
+        _QA_STATE.move_to_end((scene_hash, engine))
+        while len(_QA_STATE) > QA_STATE_MAX_ITEMS:
+            _QA_STATE.popitem(last=False)
+
+def _qa_state_get(scene_hash: str, engine: str):
+    with _QA_STATE_LOCK:
+        state = _QA_STATE.get((scene_hash, engine))
+        if state is not None:
+            _QA_STATE.move_to_end((scene_hash, engine))
+        return state
+
+def _apply_patch(doc: Dict[str, Any], ops: List[JSONPatchOp]) -> List[str]:
+    """RFC 6902의 add/replace/remove만. 바뀐 경로를 점 표기("ds.camera_move")로 돌려준다."""
+    changed = []
+    for op in ops:
+        if not op.path.startswith("/"):
+            raise ValueError(f"invalid pointer: {op.path}")
+        keys = [k.replace("~1", "/").replace("~0", "~") for k in op.path[1:].split("/")]
+        if keys[0] not in ("st", "ds", "dw", "timeline", "drafts") or (len(keys) == 1 and op.op == "remove"):
+            raise ValueError(f"path not patchable: {op.path}")
+        parent = doc
+        for k in keys[:-1]:
+            parent = parent[int(k)] if isinstance(parent, list) else parent[k]
+        last = keys[-1]
+        if isinstance(parent, list):
+            if op.op == "add":
+                parent.insert(len(parent) if last == "-" else int(last), op.value)
+            elif op.op == "replace":
+                parent[int(last)] = op.value
+            else:
+                del parent[int(last)]
+        else:
+            if op.op == "replace" and last not in parent:
+                raise ValueError(f"replace target missing: {op.path}")
+            if op.op == "remove":
+                del parent[last]
+            else:
+                parent[last] = op.value
+        changed.append(".".join(k for k in keys if not k.isdigit() and k != "-"))
+    return changed
+
+def _qa_incremental_core(payload: QAIncrementalRequest) -> QAIncrementalResponse:
+    engine = _engine(payload.engine).name
+    state = _qa_state_get(payload.base_ref, engine)
+    if state is not None and state[1] == _QA_RULES_VERSION:
+        base_scene, _, base_checks = state
+    else:
+        base_scene = state[0] if state is not None else _lookup("scene", payload.base_ref)
+        base_checks = _qa_checks(base_scene, engine)
+        _qa_state_put(payload.base_ref, engine, base_scene, base_checks)
+
+    doc = base_scene.model_dump()
+    try:
+        changed_paths = _apply_patch(doc, payload.patch)
+        scene = SceneDraft.model_validate(doc)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=json.loads(e.json(include_url=False, include_input=False)))
+    except (KeyError, IndexError, ValueError, TypeError) as e:
+        raise HTTPException(status_code=422, detail=f"patch failed: {e}")
+
+    dirty = _dirty_checks(changed_paths)
+    checks = dict(base_checks)
+    checks.update(_qa_checks(scene, engine, only=dirty))
+    scene_hash = _scene_id(scene)
+    _qa_state_put(scene_hash, engine, scene, checks)
+    _STORE.put("scene", scene_hash, scene)
+
+    def shown(v):
+        return round(v, 3) if isinstance(v, float) else v
+    changed = [
+        QACheckDiff(check=name, before=shown(base_checks.get(name)), after=shown(checks.get(name)))
+        for name in sorted(dirty)
+        if name != "engine_render" and shown(base_checks.get(name)) != shown(checks.get(name))
+    ]
+    report = _qa_report(checks)
+    base_sev = _qa_report(base_checks).severity
+    if base_sev != report.severity:
+        changed.append(QACheckDiff(check="severity", before=base_sev, after=report.severity))
+    return QAIncrementalResponse(
+        base_ref=payload.base_ref,
+        scene_hash=scene_hash,
+        recomputed=sorted(dirty),
+        changed=changed,
+        report=report,
+        engine_render=checks["engine_render"] if base_checks["engine_render"] != checks["engine_render"] else None,
     )
 
-    return QAValidateResponse(engine_render=engine_render, report=report)
+@app.post("/qa-validate/incremental", operation_id="qaValidateIncremental", response_model=QAIncrementalResponse)
+async def qa_validate_incremental(payload: QAIncrementalRequest, _: bool = Security(require_bearer)):
+    # 편집 루프용: 직전 scene + JSON patch → 바뀐 필드에 걸린 check만 다시 계산
+    return Response(await _execute("qaValidateIncremental", _qa_incremental_core, payload), media_type="application/json")
+
+# -----------------------------
+# QA bulk stream (NDJSON in → NDJSON out)
+# -----------------------------
+QA_STREAM_MAX_LINE_BYTES = int(os.getenv("QA_STREAM_MAX_LINE_BYTES", str(1 << 20)))
+
+class _NDJSONResponse(StreamingResponse):
+    media_type = "application/x-ndjson"
+
+    def __init__(self, content, status_code: int = 200, headers=None, media_type=None, background=None,
+                 op: Optional[str] = None):
+        # profiling 중인 요청이면 sync 생성기의 next()를 (돌리는 스레드에서) 직접 잰다
+        s = _PROFILE_CLAIM.get()
+        sync = not hasattr(content, "__aiter__")
+        if s is not None and sync:
+            content = _profiled_iter(s, content)
+        if op is not None and sync:
+            # op 정책의 lane에서 당긴다 (없으면 starlette가 anyio 기본 threadpool로)
+            lane = _op_lane(op, local=True)
+            lane.check()
+            content = lane.iterate(content)
+        super().__init__(content, status_code, headers, media_type, background)
+
+class _NDJSONStreamingResponse(_NDJSONResponse):
+
+    async def __call__(self, scope, receive, send):
+        # 요청 본문을 읽으면서 응답을 흘려보내므로, receive()를 가로채는 disconnect 리스너는 띄우지 않는다
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+        if self.background is not None:
+            await self.background()
+
+def _ndjson(obj) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode() + b"\n"
+
+async def _ndjson_lines(request: Request, max_line: int):
+    """(line_no, raw) 를 하나씩 yield. 한 줄이 max_line 을 넘으면 raw=None (나머지는 버림)."""
+    buf = bytearray()
+    n = 0
+    skipping = False
+    async for chunk in request.stream():
+        start = 0
+        while True:
+            i = chunk.find(b"\n", start)
+            if i < 0:
+                if not skipping:
+                    buf += chunk[start:]
+                    if len(buf) > max_line:
+                        skipping = True
+                        buf.clear()
+                break
+            n += 1
+            if skipping:
+                skipping = False
+                yield n, None
+            else:
+                buf += chunk[start:i]
+                yield n, bytes(buf) if len(buf) <= max_line else None
+            buf.clear()
+            start = i + 1
+    if buf or skipping:
+        yield n + 1, bytes(buf) if not skipping and len(buf) <= max_line else None
+
+def _qa_stream_record(line_no: int, raw: Optional[bytes]) -> bytes:
+    if raw is None:
+        return _ndjson({"line": line_no, "error": "line_too_long", "detail": f"limit {QA_STREAM_MAX_LINE_BYTES} bytes"})
+    try:
+        out = _qa_validate_core(_resolved(QAValidateRequest.model_validate_json(raw)))
+    except ValidationError as e:
+        return _ndjson({"line": line_no, "error": "invalid_request", "detail": json.loads(e.json(include_url=False, include_input=False))})
+    except HTTPException as e:
+        return _ndjson({"line": line_no, "error": "unknown_ref" if e.status_code == 404 else "invalid_request", "detail": e.detail})
+    return _dump_json(out) + b"\n"
+
+@app.post(
+    "/qa-validate/stream",
+    operation_id="qaValidateStream",
+    summary="Bulk QA (NDJSON)",
+    description="Body: one QAValidateRequest per line. Response: one QAValidateResponse per line, in input order; "
+                "bad lines become {\"line\", \"error\", \"detail\"} records.",
+    response_class=_NDJSONStreamingResponse,
+    openapi_extra={"requestBody": {"required": True, "content": {"application/x-ndjson": {"schema": {"type": "string"}}}}},
+)
+async def qa_validate_stream(request: Request, _: bool = Security(require_bearer)):
+    lane = _op_lane("qaValidateStream", local=True)
+    lane.check()
+    claim = _PROFILE_CLAIM.get()
+
+    async def gen():
+        _PROFILE_CLAIM.set(claim)   # 본문은 endpoint가 돌아간 뒤에 돈다
+        # 한 줄 읽고 → (lane에서) 채점 → 내보내기. 소비자가 느리면 업로드 읽기도 그만큼 멈춘다 (메모리 일정)
+        async for line_no, raw in _ndjson_lines(request, QA_STREAM_MAX_LINE_BYTES):
+            if raw is not None and not raw.strip():
+                continue
+            yield await lane.run(_qa_stream_record, line_no, raw, bounded=False)
+    return _NDJSONStreamingResponse(gen())
+
+# -----------------------------
+# Storyboard (트랙 전체를 beat 배열로 한 번에 계산 → scene 단위로 흘려보내기)
+# -----------------------------
+def _beat_times(req: StoryboardRequest) -> List[float]:
+    dur = req.track_duration_sec
+    if req.lyric_timings:
+        return sorted(c.t for c in req.lyric_timings if c.t < dur)
+    if req.tempo_bpm:
+        step = 60.0 / req.tempo_bpm
+        return [k * step for k in range(int(math.ceil(dur / step)))]
+    n = req.beats or max(1, round(dur / 2.0))
+    return [dur * k / n for k in range(n)]
+
+def _intensity_curve(times: List[float], duration: float, per_scene: int, accent_every: int = 0) -> List[float]:
+    """곡 전체 arc(0.7 지점 정점) × scene 내부 arc(INTENSITY_SEQ 보간) + downbeat accent, 배열 단위로."""
+    n = len(times)
+    peak = 0.7
+    song = [0.3 + 0.6 * (x / peak if x < peak else (1.0 - x) / (1.0 - peak))
+            for x in [min(1.0, t / duration) for t in times]]
+    last = len(INTENSITY_SEQ) - 1
+    scene_len = [min(per_scene, n - (i - i % per_scene)) for i in range(n)]
+    u = [(i % per_scene) / (m - 1) * last if m > 1 else 0.0 for i, m in zip(range(n), scene_len)]
+    local = [INTENSITY_SEQ[int(p)] + (INTENSITY_SEQ[min(last, int(p) + 1)] - INTENSITY_SEQ[int(p)]) * (p - int(p)) for p in u]
+    accent = [0.1 if accent_every and i % accent_every == 0 else 0.0 for i in range(n)]
+    return [round(min(1.0, max(0.0, 0.5 * g + 0.5 * l + a)), 2) for g, l, a in zip(song, local, accent)]
+
+def _storyboard_track(req: StoryboardRequest):
+    """트랙 전체의 (beat 시각, intensity, beat 텍스트). 한 요청에 한 번만 계산한다."""
+    times = _beat_times(req)
+    if not times:
+        return [], [], []
+    per = req.beats_per_scene
+    intensity = _intensity_curve(times, req.track_duration_sec, per, accent_every=4 if req.tempo_bpm else 0)
+    if req.lyric_timings:
+        cues = sorted((c for c in req.lyric_timings if c.t < req.track_duration_sec), key=lambda c: c.t)
+        texts = [c.text for c in cues]
+    else:
+        texts = [BASE_BEATS[i % per] if i % per < len(BASE_BEATS) else f"beat {i % per + 1}" for i in range(len(times))]
+    return times, intensity, texts
+
+def _storyboard_scenes(req: StoryboardRequest, first: int = 0, times: Optional[List[float]] = None,
+                       intensity: Optional[List[float]] = None, texts: Optional[List[str]] = None,
+                       t_end: Optional[float] = None):
+    """scene `first`부터. times/intensity/texts는 그 scene부터의 beat slice (process chunk), 없으면 트랙 전체.
+    t_end: slice 마지막 scene의 끝 시각 (다음 chunk의 첫 beat).
+
+    scene은 store에 넣지 않는다 (긴 트랙 하나가 공유 LRU를 밀어내지 않도록). scene_id는 내용 hash.
+    """
+    if times is None:
+        times, intensity, texts = _storyboard_track(req)
+    if t_end is None:
+        t_end = req.track_duration_sec
+    per = req.beats_per_scene
+    st, ds, dw = _scene_foundations(req.selection)
+    for k, start in enumerate(range(0, len(times), per), first):
+        stop = min(start + per, len(times))
+        timeline = [TimelineBeat(t=round(times[i], 2), beat=texts[i], intensity=intensity[i]) for i in range(start, stop)]
+        scene = _assemble_scene(req.selection, st, ds, dw, timeline)
+        end = times[stop] if stop < len(times) else t_end
+        yield StoryboardScene(index=k, t_start=round(times[start], 2), t_end=round(end, 2), scene_id=_scene_id(scene), scene=scene)
+
+@app.post(
+    "/storyboard",
+    operation_id="storyboard",
+    summary="Full-track storyboard (NDJSON)",
+    description="Streams one StoryboardScene per line, beats_per_scene beats each, as soon as each scene is built. "
+                "Storyboard scenes are not stored; send a scene inline (or expandScene it) to use it as scene_ref. "
+                "If generation fails after streaming has started, the last line is "
+                "{\"index\", \"error\", \"status\", \"detail\"} (index = first scene not delivered).",
+    response_class=_NDJSONResponse,
+    responses={200: {"model": StoryboardScene}},
+)
+async def storyboard(payload: StoryboardRequest, _: bool = Security(require_bearer)):
+    req = _resolved(payload)
+    lane = _op_lane("storyboard")
+    if lane.kind == "process":
+        lane.check()
+        return _NDJSONResponse(_storyboard_stream(req))
+    return _NDJSONResponse((_dump_json(s) + b"\n" for s in _storyboard_scenes(req)), op="storyboard")
+
+# -----------------------------
+# Procedural concept generator (variants 6개 너머: 시드 고정, cursor 페이지 / NDJSON)
+# -----------------------------
+GEN_FLAVORS = tuple(flavor for _, flavor in CONCEPT_FLAVORS) + (
+    "observational, long-take patience",
+    "playful, whip-pan energy",
+)
+GEN_CASTS = (
+    ("lead (20s)", "friend (20s)"),
+    ("lead (20s)",),
+    ("lead (20s)", "stranger (30s)"),
+    ("two friends (20s)", "passing crowd"),
+)
+GEN_STORYLINES = (
+    "Meet-cute to parting micro-journey aligned to chorus/bridge beats.",
+    "Chance reunion that turns on a single shared object at the chorus.",
+    "Solo walk home where the bridge flips memory into present tense.",
+    "Two paths converging on one street corner at the final chorus.",
+    "Quiet ritual repeated each verse, broken once at the bridge.",
+)
+
+class _ConceptSpace:
+    """flavor × palette × lighting × cast × storyline 조합 공간.
+
+    위치 pos → (mul·pos + add) mod total 로 섞은 뒤 mixed-radix로 축 값을 꺼낸다. 전단사라서 중복이 없고,
+    어느 pos든 O(1)이라 전체를 만들지 않고도 임의 페이지를 (여러 worker가 동시에) 뽑을 수 있다.
+    """
+
+    def __init__(self, info: AlbumInfo, controls: Optional[Controls], seed: int):
+        scores = _LEXICON.match(f"{info.style} {info.lyrics}")
+        palettes = [controls.palette_override] if controls and controls.palette_override else _LEXICON.options("palette", scores["palette"])
+        lightings = [controls.lighting_override] if controls and controls.lighting_override else _LEXICON.options("lighting", scores["lighting"])
+        self.info = info
+        self.base_id = _slug(info.title or "concept")
+        self.axes = (GEN_FLAVORS, palettes, lightings, GEN_CASTS, GEN_STORYLINES)
+        self.total = math.prod(len(axis) for axis in self.axes)
+        h = hashlib.sha256(f"concept-space:{seed}".encode()).digest()
+        mul = 1 + int.from_bytes(h[:8], "big") % max(1, self.total - 1)
+        while math.gcd(mul, self.total) != 1:
+            mul += 1
+        self.mul = mul
+        self.add = int.from_bytes(h[8:16], "big") % self.total
+        fp = json.dumps([seed, info.title, info.style, info.lyrics, palettes, lightings], ensure_ascii=False)
+        self.fingerprint = hashlib.sha256(fp.encode()).hexdigest()[:12]
+
+    def concept(self, pos: int) -> Concept:
+        combo = rest = (self.mul * pos + self.add) % self.total
+        picks = []
+        for axis in self.axes:
+            rest, k = divmod(rest, len(axis))
+            picks.append(axis[k])
+        flavor, palette, lighting, cast, storyline = picks
+        return Concept(
+            id=f"{self.base_id}-v{combo}",
+            title=f"{self.info.title} — V{combo}",
+            logline=f"{flavor} take inspired by lyrics; one clear action per shot; character-first.",
+            style=self.info.style,
+            cast=list(cast),
+            anchors={"palette": list(palette), "lighting": list(lighting), "props": ["phone", "jacket", "hot pack"]},
+            storyline=storyline,
+        )
+
+    def page(self, start: int, limit: int):
+        for pos in range(start, min(start + limit, self.total)):
+            yield self.concept(pos)
+
+    def cursor(self, pos: int) -> Optional[str]:
+        if pos >= self.total:
+            return None
+        return base64.urlsafe_b64encode(f"{pos}.{self.fingerprint}".encode()).decode().rstrip("=")
+
+    def offset(self, cursor: Optional[str]) -> int:
+        if not cursor:
+            return 0
+        try:
+            pos, fp = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode().split(".")
+            pos = int(pos)
+        except ValueError:
+            raise HTTPException(status_code=422, detail="malformed cursor")
+        if fp != self.fingerprint or not 0 <= pos < self.total:
+            raise HTTPException(status_code=422, detail="cursor does not belong to this album/seed/controls")
+        return pos
+
+def _generate_concepts_core(payload: ConceptGenerateRequest) -> ConceptPage:
+    space = _ConceptSpace(payload.album_info, payload.controls, payload.seed)
+    start = space.offset(payload.cursor)
+    concepts = list(space.page(start, payload.limit))
+    for c in concepts:
+        _STORE.put("concept", c.id, c)
+    return ConceptPage(concepts=concepts, total=space.total, next_cursor=space.cursor(start + len(concepts)))
+
+@app.post("/derive-concepts/generate", operation_id="generateConcepts", response_model=ConceptPage)
+async def generate_concepts(payload: ConceptGenerateRequest, request: Request, _: bool = Security(require_bearer)):
+    # 같은 seed + cursor → 같은 페이지라 응답 캐시/ETag가 그대로 먹는다
+    return await _cached_json("generateConcepts", payload, request, _generate_concepts_core)
+
+@app.post(
+    "/derive-concepts/generate/stream",
+    operation_id="generateConceptsStream",
+    summary="Procedural concepts (NDJSON)",
+    description="One Concept per line from the cursor on, up to limit. X-Next-Cursor resumes after the last line. "
+                "Streamed concepts are not stored; fetch the page (generateConcepts) to use an id as selection_ref.",
+    response_class=_NDJSONResponse,
+    responses={200: {"model": Concept}},
+)
+async def generate_concepts_stream(payload: ConceptStreamRequest, _: bool = Security(require_bearer)):
+    space = _ConceptSpace(payload.album_info, payload.controls, payload.seed)
+    start = space.offset(payload.cursor)
+    next_cursor = space.cursor(start + payload.limit)
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    return _NDJSONResponse((_dump_json(c) + b"\n" for c in space.page(start, payload.limit)), headers=headers,
+                           op="generateConceptsStream")
+
+# -----------------------------
+# Pipeline batch (derive → compose → expand → QA)
+# -----------------------------
+def _pipeline_item(item: PipelineItem) -> PipelineResult:
+    concepts = _derive_concepts_core(
+        DeriveConceptsRequest(album_info=item.album_info, controls=item.controls)
+    ).concepts
+    sel = concepts[min(item.pick, len(concepts) - 1)]
+    stills = _compose_stills_core(ComposeStillsRequest(selection=sel, count=item.count)).stills
+    scene = _expand_scene_core(
+        ExpandSceneRequest(
+            brief=item.brief or sel.logline,
+            selection=sel,
+            duration_sec=item.duration_sec,
+            beats=item.beats,
+        )
+    ).scene
+    qa = _qa_validate_core(QAValidateRequest(scene=scene, engine=item.engine))
+    # 전부 core가 만든 검증된 인스턴스 → 껍데기는 model_construct로
+    return PipelineResult.model_construct(concepts=concepts, selection_id=sel.id, stills=stills, scene=scene, qa=qa)
+
+def _pipeline_batch_core(payload: PipelineBatchRequest) -> PipelineBatchResponse:
+    # concept/scene은 ref로 쓸 수 있게 남기되 bulk 구역에 (STORE_BULK_*: 수백 앨범 batch도 interactive LRU는 그대로)
+    return PipelineBatchResponse.model_construct(
+        results=[_STORE.capture(_pipeline_item, it, bulk=True) for it in payload.items])
+
+@app.post("/pipeline/batch", operation_id="pipelineBatch", response_model=PipelineBatchResponse)
+async def pipeline_batch(payload: PipelineBatchRequest, _: bool = Security(require_bearer)):
+    # 앨범마다 4번 왕복하던 e2e 흐름을 한 번의 호출로 (인증/검증도 한 번)
+    return Response(await _execute("pipelineBatch", _pipeline_batch_core, payload), media_type="application/json")
+
+# -----------------------------
+# Scene search: 변형 조합을 process pool에서 QA 채점 → top-k
+# -----------------------------
+# 축은 이미 있는 값들: STILL_FRAMES의 framing/DOF/lens/move + _scene_foundations의 기본 ST/DS
+_FOUNDATION_FRAMING = ("medium shot, eye-level", "shallow")
+SEARCH_FRAMINGS = (_FOUNDATION_FRAMING,) + tuple(
+    dict.fromkeys((label, dof.removesuffix(" DOF")) for label, _, dof, _ in STILL_FRAMES)
+)
+SEARCH_LENSES = tuple(dict.fromkeys([85] + [int(lens.split()[0]) for _, lens, _, _ in STILL_FRAMES]))
+SEARCH_MOVES = tuple(dict.fromkeys(["slow push-in"] + [move for _, _, _, move in STILL_FRAMES]))
+# 변형마다 달라지는 필드. 여기에 걸린 rule만 변형별로 보고(prune), 나머지는 기본 scene에서 한 번
+SEARCH_AXIS_PATHS = ("st.framing", "st.lens_mm", "st.dof", "ds.camera_move", "timeline", "drafts")
+def _cpu_cores() -> int:
+    try:
+        return max(1, len(os.sched_getaffinity(0)))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+# serve.py worker 수 (공유 store가 없으면 1). process pool은 worker마다 하나씩이므로 코어를 worker 수로 나눠 갖는다
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", "").strip() or 0) or (_cpu_cores() if STORE_SQLITE_PATH else 1))
+SEARCH_WORKERS = int(os.getenv("SEARCH_WORKERS", "0") or 0) or max(1, _cpu_cores() // WEB_CONCURRENCY)
+SEARCH_PARALLEL_MIN = int(os.getenv("SEARCH_PARALLEL_MIN", "128"))
+_SEV_RANK = {"info": 0, "warn": 1, "fail": 2}
+
+def _search_variants(beat_options: List[int], limit: int):
+    n = 0
+    for beats in dict.fromkeys(beat_options):
+        for framing, dof in SEARCH_FRAMINGS:
+            for lens in SEARCH_LENSES:
+                for move in SEARCH_MOVES:
+                    if n >= limit:
+                        return
+                    n += 1
+                    yield [framing, lens, dof, move, beats]
+
+def _search_chunk(job: bytes) -> bytes:
+    """worker 진입점. JSON bytes in/out (pickle 되는 건 bytes뿐). 반환: 이 chunk의 top_k + pruned 수.
+
+    story_match는 변형의 draft를 요청 brief에 대고 잰다. 변형 축에 걸린 rule이 fire 하면 채점 전에 버리고(pruned),
+    축과 무관한 rule은 기본 scene에서 한 번만 봐서 모든 후보의 conflicts에 그대로 싣는다.
+    """
+    spec = json.loads(job)
+    sel = Concept.model_validate(spec["selection"])
+    engine, top_k, duration = spec["engine"], spec["top_k"], spec["duration"]
+    brief = _text_words(spec["brief"])
+    st0, ds0, dw = _scene_foundations(sel)
+    timelines: Dict[int, List[TimelineBeat]] = {}
+    varying = _dirty_checks(list(SEARCH_AXIS_PATHS))
+    per_variant = [r for r in _QA_RULES if r.enabled and "rule:" + r.id in varying]
+    fixed = [r for r in _QA_RULES if r.enabled and "rule:" + r.id not in varying]
+    only = {"story_match", "coverage"}
+    kept, pruned = [], 0
+    for i, (framing, lens, dof, move, beats) in enumerate(spec["variants"]):
+        if beats not in timelines:
+            timelines[beats] = _build_timeline(beats, duration)
+        st = st0.model_copy(update={"framing": framing, "lens_mm": lens, "dof": dof})
+        ds = ds0.model_copy(update={"camera_move": move})
+        scene = _assemble_scene(sel, st, ds, dw, timelines[beats])
+        ctx: Dict[str, Any] = {}
+        if any(rule(scene, ctx) for rule in per_variant):
+            pruned += 1   # 이 변형 때문에 생긴 hard conflict → 점수 계산 안 함
+            continue
+        kept.append((i, scene, [framing, lens, dof, move, beats]))
+    base_checks: Dict[str, Any] = {}
+    if kept:
+        ctx = {}
+        base_checks = {"rule:" + r.id: r(kept[0][1], ctx) for r in fixed}
+    scored = []
+    matches = _story_matches([scene for _, scene, _ in kept], engine, brief=brief)
+    for (i, scene, variant), match in zip(kept, matches):
+        checks = _qa_checks(scene, engine, only=only, story_match=match)
+        checks.update(base_checks)
+        report = _qa_report(checks)
+        key = (_SEV_RANK[report.severity], -round(checks["story_match"] + checks["coverage"], 6), spec["offset"] + i)
+        scored.append((key, scene, report, variant))
+    top = heapq.nsmallest(top_k, scored, key=lambda x: x[0])
+    return json.dumps({"pruned": pruned, "top": [
+        {"key": list(k), "variant": v, "report": r.model_dump(mode="json"), "scene": json.loads(_dump_json(s))}
+        for k, s, r, v in top
+    ]}).encode()
+
+def _search_scenes_core(payload: SceneSearchRequest) -> SceneSearchResponse:
+    engine = _engine(payload.engine).name
+    variants = list(_search_variants(payload.beat_options, payload.max_candidates))
+    base = {"selection": payload.selection.model_dump(mode="json"), "engine": engine, "brief": payload.brief,
+            "top_k": payload.top_k, "duration": float(payload.duration_sec)}
+    if SEARCH_WORKERS > 1 and len(variants) >= SEARCH_PARALLEL_MIN and not _IN_PROCESS_WORKER:
+        size = max(16, math.ceil(len(variants) / (SEARCH_WORKERS * 4)))
+        jobs = [json.dumps({**base, "offset": o, "variants": variants[o:o + size]}).encode()
+                for o in range(0, len(variants), size)]
+        parts = [json.loads(b) for b in _lane("process").map(_search_chunk, jobs)]
+    else:
+        parts = [json.loads(_search_chunk(json.dumps({**base, "offset": 0, "variants": variants}).encode()))]
+
+    top = heapq.nsmallest(payload.top_k, (t for p in parts for t in p["top"]), key=lambda t: t["key"])
+    candidates = []
+    for rank, t in enumerate(top, 1):
+        scene = SceneDraft.model_validate(t["scene"])
+        scene_id = _scene_id(scene)
+        _STORE.put("scene", scene_id, scene)
+        framing, lens, dof, move, beats = t["variant"]
+        candidates.append(SceneCandidate(
+            rank=rank, scene_id=scene_id, report=QAReport.model_validate(t["report"]), scene=scene,
+            variant=SceneVariant(framing=framing, lens_mm=lens, dof=dof, camera_move=move, beats=beats),
+        ))
+    return SceneSearchResponse(evaluated=len(variants), pruned=sum(p["pruned"] for p in parts), candidates=candidates)
+
+@app.post("/expand-scene/search", operation_id="searchScenes", response_model=SceneSearchResponse)
+async def search_scenes(payload: SceneSearchRequest, request: Request, _: bool = Security(require_bearer)):
+    # 클라이언트가 변형을 하나씩 expand → qa-validate 하던 왕복을 서버 쪽 병렬 탐색 한 번으로
+    return await _cached_json("searchScenes", _resolved(payload), request, _search_scenes_core)
+
+# -----------------------------
+# Execution policies (op별 실행 자리: event loop inline / 전용 thread pool / warm process pool)
+# -----------------------------
+# 핸들러는 async 이고 계산만 policy가 정한 lane으로 보낸다 (anyio 기본 threadpool을 거치지 않는다).
+#   inline      event loop에서 바로 (수십 us 짜리)
+#   <pool 이름>  전용 ThreadPoolExecutor. 대기열(queue)이 차면 503 + Retry-After
+#   process     warm ProcessPoolExecutor. JSON bytes in/out, core가 store에 넣은 객체는 부모가 다시 넣는다
+# EXEC_POLICIES='{"expandScene": "inline", "qaValidate": "process"}'   (기본표 위에 덮어쓰기)
+# EXEC_POOLS='{"interactive": {"workers": 4, "queue": 256}, "process": {"workers": 2, "queue": 16}}'
+DEFAULT_EXEC_POLICIES = {
+    "deriveConcepts": "inline", "composeStills": "inline", "generateConcepts": "inline",
+    "expandScene": "interactive", "qaValidate": "interactive", "qaValidateIncremental": "interactive",
+    "searchScenes": "bulk", "generateConceptsStream": "bulk", "qaValidateStream": "bulk",
+    "pipelineBatch": "process", "storyboard": "process",
+}
+DEFAULT_EXEC_POOLS = {
+    "interactive": {"workers": 4, "queue": 256},
+    "bulk": {"workers": 2, "queue": 32},
+    "process": {"workers": SEARCH_WORKERS, "queue": 16},
+}
+STORYBOARD_CHUNK_SCENES = int(os.getenv("STORYBOARD_CHUNK_SCENES", "16"))
+EXEC_PROCESS_NICE = int(os.getenv("EXEC_PROCESS_NICE", "10"))   # process worker의 CPU 우선순위를 낮춰 interactive 요청에 양보
+
+def _storyboard_chunk(req: StoryboardRequest, first: int, times: List[float], intensity: List[float],
+                      texts: List[str], t_end: float) -> bytes:
+    return b"".join(_dump_json(s) + b"\n" for s in _storyboard_scenes(req, first, times, intensity, texts, t_end))
+
+# process lane에서 돌릴 수 있는 op: (요청 모델, payload[, *args] → 응답 bytes). 요청 밖의 상태를 읽는 op는 제외
+_PROCESS_OPS = {
+    "deriveConcepts": (DeriveConceptsRequest, lambda p: _dump_json(_derive_concepts_core(p))),
+    "composeStills": (ComposeStillsRequest, lambda p: _dump_json(_compose_stills_core(p))),
+    "expandScene": (ExpandSceneRequest, lambda p: _dump_json(_expand_scene_core(p))),
+    "qaValidate": (QAValidateRequest, lambda p: _dump_json(_qa_validate_remembered(p))),
+    "generateConcepts": (ConceptGenerateRequest, lambda p: _dump_json(_generate_concepts_core(p))),
+    "searchScenes": (SceneSearchRequest, lambda p: _dump_json(_search_scenes_core(p))),
+    "pipelineBatch": (PipelineBatchRequest, lambda p: _dump_json(_pipeline_batch_core(p))),
+    "storyboard": (StoryboardRequest, _storyboard_chunk),
+}
+
+def _load_exec_config():
+    policies = {**DEFAULT_EXEC_POLICIES, **json.loads(os.getenv("EXEC_POLICIES", "").strip() or "{}")}
+    pools = {k: dict(v) for k, v in DEFAULT_EXEC_POOLS.items()}
+    for name, spec in json.loads(os.getenv("EXEC_POOLS", "").strip() or "{}").items():
+        pools.setdefault(name, {"workers": 2, "queue": 32}).update(spec)
+    for op, policy in policies.items():
+        if policy != "inline" and policy not in pools:
+            raise ValueError(f"EXEC_POLICIES: unknown pool '{policy}' for {op}")
+        if policy == "process" and op not in _PROCESS_OPS:
+            raise ValueError(f"EXEC_POLICIES: {op} cannot run in the process pool")
+    return policies, pools
+
+EXEC_POLICIES, EXEC_POOLS = _load_exec_config()
+_IN_PROCESS_WORKER = False
+
+class _Lane:
+    """실행 자리 하나 + 대기열 상한 + 대기/실행 시간 histogram (process는 왕복 시간만)."""
+
+    def __init__(self, name: str, workers: int = 0, queue: int = 0):
+        self.name = name
+        self.kind = "inline" if name == "inline" else "process" if name == "process" else "threads"
+        self.workers = max(1, int(workers))
+        self.queue_max = max(0, int(queue))
+        self.queued = self.running = 0
+        self.submitted = self.completed = self.rejected = self.errors = 0
+        self.wait = _RouteStats()
+        self.run_ms = _RouteStats()
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _full(self) -> bool:
+        waiting = self.queued if self.kind == "threads" else self.running - self.workers
+        return self.kind != "inline" and waiting >= self.queue_max
+
+    def _reject(self):
+        self.rejected += 1
+        raise HTTPException(status_code=503, detail=f"{self.name} queue is full ({self.queue_max})",
+                            headers={"Retry-After": "1"})
+
+    def check(self):
+        """streaming 응답은 헤더를 보낸 뒤에 일을 넣으므로, 대기열 상한은 응답을 만들기 전에 여기서 본다."""
+        with self._lock:
+            if self._full():
+                self._reject()
+
+    def _admit(self, bounded: bool = True):
+        with self._lock:
+            if bounded and self._full():
+                self._reject()
+            self.submitted += 1
+            if self.kind == "process":
+                self.running += 1
+            else:
+                self.queued += 1
+
+    def _done(self, ms: float, ok: bool):
+        with self._lock:
+            self.running -= 1
+            self.completed += 1
+            self.errors += not ok
+            self.run_ms.add(ms)
+
+    def _call(self, t_submit: float, timing, fn, args):
+        t0 = time.perf_counter()
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+            self.wait.add((t0 - t_submit) * 1000)
+        if timing is not None and self.kind != "inline":
+            timing["queue"] = (t0 - t_submit) * 1000
+        ok = False
+        try:
+            out = fn(*args)
+            ok = True
+            return out
+        finally:
+            self._done((time.perf_counter() - t0) * 1000, ok)
+
+    def executor(self) -> concurrent.futures.ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = concurrent.futures.ThreadPoolExecutor(self.workers, thread_name_prefix=f"lane-{self.name}")
+        return self._executor
+
+    async def run(self, fn, *args, timing=None, bounded: bool = True):
+        """inline / thread lane에서 fn(*args). 프로파일링 중인 요청이면 그 구간을 잰다 (executor는 contextvar를 안 넘긴다)."""
+        s = _PROFILE_CLAIM.get()
+        if s is not None:
+            fn, args = s.measure, (fn, *args)
+        self._admit(bounded)
+        t_submit = time.perf_counter()
+        if self.kind == "inline":
+            return self._call(t_submit, timing, fn, args)
+        return await asyncio.get_running_loop().run_in_executor(self.executor(), self._call, t_submit, timing, fn, args)
+
+    async def iterate(self, it, batch: int = 8):
+        """sync 생성기(bytes)를 이 lane에서 당겨 온다. hop 한 번에 최대 batch개 (대기열 상한은 check()에서)."""
+        it = iter(it)
+
+        def pull():
+            return list(itertools.islice(it, batch))
+
+        while True:
+            chunk = await self.run(pull, bounded=False)
+            if chunk:
+                yield b"".join(chunk)
+            if len(chunk) < batch:
+                return
+
+    async def run_job(self, op: str, payload: bytes, *args, timing=None, bounded: bool = True,
+                      puts: Optional[list] = None) -> bytes:
+        """process lane: (op, args, 요청 JSON) → worker → 응답 bytes. store 기록은 여기(부모)에서 다시 넣는다."""
+        self._admit(bounded)
+        t0 = time.perf_counter()
+        ok = False
+        try:
+            job = json.dumps([op, *args]).encode() + b"\n" + payload
+            pool = _process_pool()
+            try:
+                out = await asyncio.wrap_future(pool.submit(_process_job, job))
+            except BrokenProcessPool:
+                # worker가 죽었다 (OOM kill 등): pool을 갈아 끼우고 한 번만 다시
+                try:
+                    out = await asyncio.wrap_future(_process_pool(broken=pool).submit(_process_job, job))
+                except BrokenProcessPool:
+                    raise _process_pool_unavailable()
+            ok = True
+        finally:
+            self._done((time.perf_counter() - t0) * 1000, ok)
+        if timing is not None:
+            timing["process"] = (time.perf_counter() - t0) * 1000
+        return _replay_store(out, puts)
+
+    def map(self, fn, jobs: List[bytes]) -> List[bytes]:
+        """process pool에 bytes job 여러 개 (search chunk). 요청 하나의 일부라 대기열 상한은 보지 않는다."""
+        for _ in jobs:
+            self._admit(bounded=False)
+        t0 = time.perf_counter()
+        ok = False
+        try:
+            pool = _process_pool()
+            try:
+                out = list(pool.map(fn, jobs))
+            except BrokenProcessPool:
+                try:
+                    out = list(_process_pool(broken=pool).map(fn, jobs))
+                except BrokenProcessPool:
+                    raise _process_pool_unavailable()
+            ok = True
+            return out
+        finally:
+            ms = (time.perf_counter() - t0) * 1000
+            for _ in jobs:
+                self._done(ms, ok)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out = {"kind": self.kind, "workers": self.workers if self.kind != "inline" else None,
+                   "queue_max": self.queue_max if self.kind != "inline" else None,
+                   "queued": self.queued if self.kind != "process" else max(0, self.running - self.workers),
+                   "running": self.running if self.kind != "process" else min(self.running, self.workers),
+                   "submitted": self.submitted, "completed": self.completed, "rejected": self.rejected,
+                   "errors": self.errors,
+                   "run_p50_ms": round(self.run_ms.quantile(0.50), 3), "run_p99_ms": round(self.run_ms.quantile(0.99), 3)}
+            if self.kind == "threads":
+                out["wait_p50_ms"] = round(self.wait.quantile(0.50), 3)
+                out["wait_p99_ms"] = round(self.wait.quantile(0.99), 3)
+            return out
+
+_LANES: Dict[str, _Lane] = {}
+_LANES_LOCK = threading.Lock()
+
+def _lane(name: str) -> _Lane:
+    lane = _LANES.get(name)
+    if lane is None:
+        with _LANES_LOCK:
+            lane = _LANES.get(name)
+            if lane is None:
+                spec = EXEC_POOLS.get(name, {})
+                lane = _LANES[name] = _Lane(name, spec.get("workers", 0), spec.get("queue", 0))
+    return lane
+
+def _op_lane(op: str, local: bool = False) -> _Lane:
+    """local=True: 호출한 process 안에서 돌아야 하는 작업 (/ws 세션 상태) → process 정책이면 interactive."""
+    policy = EXEC_POLICIES.get(op, "interactive")
+    if local and policy == "process":
+        policy = "interactive"
+    return _lane(policy)
+
+def _compute(core, payload, timing, puts: Optional[list] = None) -> bytes:
+    t = time.perf_counter()
+    result = _STORE.capture(core, payload, puts=puts)
+    t1 = time.perf_counter()
+    body = _dump_json(result)
+    if timing is not None:
+        timing["handler"] = (t1 - t) * 1000
+        timing["serialize"] = (time.perf_counter() - t1) * 1000
+    return body
+
+async def _execute(op: str, core, payload, timing=None, puts: Optional[list] = None) -> bytes:
+    """op 정책대로 core(payload) → 응답 JSON bytes. puts: core가 store에 넣은 것을 여기에도 적는다.
+    store에 넣은 게 있으면 SQLite commit까지 기다렸다가 돌려준다 (다른 worker로 간 다음 요청의 ref가 404 나지 않게)."""
+    lane = _op_lane(op)
+    if puts is None:
+        puts = []
+    if lane.kind == "process":
+        body = await lane.run_job(op, _dump_json(payload), timing=timing, puts=puts)
+    else:
+        body = await lane.run(_compute, core, payload, timing, puts, timing=timing)
+    if puts:
+        t = time.perf_counter()
+        await _STORE.synced()
+        if timing is not None:
+            timing["store"] = (time.perf_counter() - t) * 1000
+    return body
+
+# ---- process pool (process lane + search chunk 공용) ----
+_PROCESS_POOL = None
+_PROCESS_POOL_GEN = None
+_PROCESS_POOL_LOCK = threading.Lock()
+
+def _process_start_method() -> str:
+    """다른 thread가 없을 때(부팅 직후 warm_pools)만 fork. 요청을 받는 중에 fork하면 lane thread가 쥐고 있던
+    모듈 락(QA state, metrics, 응답 캐시 …)이 잠긴 채로 복사될 수 있어서, 그때는 forkserver(없으면 spawn)."""
+    methods = multiprocessing.get_all_start_methods()
+    if "fork" in methods and threading.active_count() == 1:
+        return "fork"
+    return "forkserver" if "forkserver" in methods else "spawn"
+
+def _process_worker_state() -> tuple:
+    """fork가 아닌 worker는 app을 새로 import 하므로, 지금의 rule 테이블(on/off 포함)과 engine을 넘겨준다."""
+    rules = [(r.spec, r.enabled) for r in _QA_RULES]
+    engines = [(r.name, r.draft.text, r.block.text, r.draft_key, {k: v for k, v in r.vars.items() if k != "engine"})
+               for r in _ENGINES.values()]
+    return _QA_RULES_VERSION, rules, engines
+
+def _process_pool(broken=None):
+    """fork된 worker는 그 시점의 rule/engine 테이블(과 rule on/off)을 들고 있으므로, 바뀌면 pool을 새로 띄운다.
+    broken: BrokenProcessPool을 낸 pool. 다른 요청이 아직 안 바꿨을 때만 새로 띄운다."""
+    global _PROCESS_POOL, _PROCESS_POOL_GEN
+    gen = (_QA_RULES_VERSION, tuple(_ENGINES))
+    with _PROCESS_POOL_LOCK:
+        if _PROCESS_POOL is None or _PROCESS_POOL_GEN != gen or (broken is not None and _PROCESS_POOL is broken):
+            if _PROCESS_POOL is not None:
+                # 테이블이 바뀐 경우 이미 넣은 job은 옛 worker가 마저 끝낸다
+                _PROCESS_POOL.shutdown(wait=False, cancel_futures=_PROCESS_POOL is broken)
+            method = _process_start_method()
+            ctx = multiprocessing.get_context(method)
+            if method == "forkserver":
+                ctx.set_forkserver_preload([__name__])
+            state = None if method == "fork" else _process_worker_state()
+            _PROCESS_POOL = concurrent.futures.ProcessPoolExecutor(
+                max_workers=_lane("process").workers, mp_context=ctx,
+                initializer=_process_worker_init, initargs=(state,))
+            _PROCESS_POOL_GEN = gen
+        return _PROCESS_POOL
+
+def _process_pool_unavailable() -> HTTPException:
+    return HTTPException(status_code=503, detail="process pool unavailable (worker died); retry",
+                         headers={"Retry-After": "1"})
+
+def _process_worker_init(state: Optional[tuple] = None):
+    global _IN_PROCESS_WORKER, _QA_RULES, _QA_RULES_VERSION
+    _IN_PROCESS_WORKER = True
+    if state is not None:
+        _QA_RULES_VERSION, rules, engines = state
+        _QA_RULES = tuple(_CompiledRule(spec) for spec, _ in rules)
+        for rule, (_, enabled) in zip(_QA_RULES, rules):
+            rule.enabled = enabled
+        _ENGINES.clear()
+        for name, draft, block, draft_key, vars in engines:
+            register_engine(name, draft, block, draft_key=draft_key, **vars)
+    if EXEC_PROCESS_NICE and hasattr(os, "nice"):
+        os.nice(EXEC_PROCESS_NICE)
+    _STORE.recording = []   # worker의 store.put은 부모로 돌려보낼 기록만
+    # 부모가 SIGKILL 등으로 정리 없이 죽으면 fork로 물려받은 listen 소켓을 쥔 채 남지 않도록 따라 죽는다
+    parent = os.getppid()
+    def watch_parent():
+        while os.getppid() == parent:
+            time.sleep(1.0)
+        os._exit(0)
+    threading.Thread(target=watch_parent, name="parent-watch", daemon=True).start()
+
+def _process_job(job: bytes) -> bytes:
+    """worker 진입점. '[op, *args]\\n요청 JSON' → '[[kind, id, len], ...]\\n객체 JSON들 + 응답 bytes'."""
+    head, _, payload = job.partition(b"\n")
+    op, *args = json.loads(head)
+    model, run = _PROCESS_OPS[op]
+    body = run(model.model_validate_json(payload), *args)
+    puts, _STORE.recording = _STORE.recording, []
+    raws = [obj if isinstance(obj, bytes) else _dump_json(obj) for _, _, obj, _ in puts]
+    index = [[kind, obj_id, len(raw), bulk] for (kind, obj_id, _, bulk), raw in zip(puts, raws)]
+    return json.dumps(index).encode() + b"\n" + b"".join(raws) + body
+
+def _replay_store(out: bytes, puts: Optional[list] = None) -> bytes:
+    head, _, rest = out.partition(b"\n")
+    view = memoryview(rest)
+    pos = 0
+    for kind, obj_id, n, bulk in json.loads(head):
+        raw = bytes(view[pos:pos + n])
+        _STORE.put_raw(kind, obj_id, raw, bulk)
+        if puts is not None:
+            puts.append((kind, obj_id, raw, bulk))
+        pos += n
+    return bytes(view[pos:])
+
+async def _storyboard_stream(req: StoryboardRequest):
+    """storyboard를 scene 구간별 process job으로 나눠 worker 수만큼 미리 돌리고, 순서대로 흘려보낸다.
+    beat 배열은 여기서 한 번 계산하고 job마다 자기 구간 slice만 보낸다 (가사 cue는 payload에서 뺀다)."""
+    lane = _lane("process")
+    times, intensity, texts = _storyboard_track(req)
+    n, per = len(times), req.beats_per_scene
+    payload = _dump_json(req.model_copy(update={"lyric_timings": None}))
+    step = STORYBOARD_CHUNK_SCENES * per
+    pending = deque()   # (chunk 첫 scene index, task)
+
+    async def take():
+        # 헤더(200)는 이미 나갔으므로 실패는 예외 대신 마지막 NDJSON 레코드로 알린다 (qaValidateStream의 line 오류처럼)
+        first, task = pending.popleft()
+        try:
+            return await task, False
+        except HTTPException as e:
+            return _ndjson({"index": first, "error": "unavailable", "status": e.status_code, "detail": e.detail}), True
+        except Exception:
+            logging.getLogger("uvicorn.error").exception("storyboard chunk from scene %d failed", first)
+            return _ndjson({"index": first, "error": "internal", "status": 500, "detail": "Internal Server Error"}), True
+
+    try:
+        for a in range(0, n, step):
+            b = min(a + step, n)
+            t_end = times[b] if b < n else req.track_duration_sec
+            pending.append((a // per, asyncio.ensure_future(lane.run_job(
+                "storyboard", payload, a // per, times[a:b], intensity[a:b], texts[a:b], t_end, bounded=False))))
+            if len(pending) > lane.workers:
+                body, failed = await take()
+                yield body
+                if failed:
+                    return
+        while pending:
+            body, failed = await take()
+            yield body
+            if failed:
+                return
+    finally:
+        for _, task in pending:
+            task.cancel()
+
+def warm_pools():
+    """serve.py worker가 요청을 받기 전에: thread lane을 만들고 process pool worker를 미리 fork."""
+    for name in set(EXEC_POLICIES.values()) - {"inline", "process"}:
+        _lane(name).executor()
+    if "process" in EXEC_POLICIES.values() or SEARCH_WORKERS > 1:
+        list(_process_pool().map(abs, range(_lane("process").workers)))
+
+def shutdown_pools():
+    """lifespan shutdown: uvicorn은 종료 뒤 받은 SIGTERM을 다시 raise 하므로 atexit에 기대지 않고 여기서 닫는다."""
+    global _PROCESS_POOL
+    with _PROCESS_POOL_LOCK:
+        if _PROCESS_POOL is not None:
+            _PROCESS_POOL.shutdown(wait=True, cancel_futures=True)
+            _PROCESS_POOL = None
+    for lane in list(_LANES.values()):
+        if lane._executor is not None:
+            lane._executor.shutdown(wait=False, cancel_futures=True)
+            lane._executor = None
+    _STORE.flush()   # write-behind로 아직 SQLite에 안 들어간 concept/scene
+
+app.add_event_handler("shutdown", shutdown_pools)
+
+def _exec_stats() -> Dict[str, Any]:
+    return {"policies": dict(sorted(EXEC_POLICIES.items())), "lanes": {k: v.stats() for k, v in sorted(_LANES.items())}}
+
+# -----------------------------
+# WebSocket session (/ws): 한 번 인증, 이후 op 메시지를 id로 다중화
+# -----------------------------
+# → {"id": "c1", "op": "expandScene", "payload": {...}}
+# ← {"id": "c1", "op": "expandScene", "ok": true, "result": {...}}  |  {"id", "op", "ok": false, "status", "error"}
+# 끝나는 순서대로 답한다. selection_ref / scene_ref 는 이 연결에서 만든 것부터 찾는다.
+WS_MAX_INFLIGHT = int(os.getenv("WS_MAX_INFLIGHT", "16"))
+WS_MAX_MESSAGE_BYTES = int(os.getenv("WS_MAX_MESSAGE_BYTES", str(1 << 20)))
+WS_SESSION_MAX_ITEMS = int(os.getenv("WS_SESSION_MAX_ITEMS", "1000"))
+WS_AUTH_TIMEOUT_SEC = float(os.getenv("WS_AUTH_TIMEOUT_SEC", "10"))
+
+_WS_OPS = {
+    "deriveConcepts": (DeriveConceptsRequest, _derive_concepts_core),
+    "composeStills": (ComposeStillsRequest, _compose_stills_core),
+    "expandScene": (ExpandSceneRequest, _expand_scene_core),
+    "qaValidate": (QAValidateRequest, _qa_validate_core),
+}
+
+class _WSSession:
+    """연결 하나의 상태: 만든 concept/scene (LRU). 메시지는 threadpool에서 돌므로 락."""
+
+    def __init__(self, key_id: str):
+        self.key_id = key_id
+        self.objects: "OrderedDict[tuple, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, kind: str, ref: str):
+        with self._lock:
+            return self.objects.get((kind, ref))
+
+    def remember(self, kind: str, obj_id: Optional[str], obj) -> None:
+        if not obj_id:
+            return
+        with self._lock:
+            self.objects[(kind, obj_id)] = obj
+            self.objects.move_to_end((kind, obj_id))
+            while len(self.objects) > WS_SESSION_MAX_ITEMS:
+                self.objects.popitem(last=False)
+
+    def run(self, op: str, payload: Any) -> bytes:
+        model, core = _WS_OPS[op]
+        req = _resolved(model.model_validate(payload), self)
+        result = _PROFILER.run(op, core, req)
+        if isinstance(result, DeriveConceptsResponse):
+            for c in result.concepts:
+                self.remember("concept", c.id, c)
+        elif isinstance(result, ExpandSceneResponse):
+            self.remember("scene", result.scene_id, result.scene)
+        elif isinstance(result, QAValidateResponse):
+            self.remember("scene", result.scene_hash, req.scene)
+        return _dump_json(result)
+
+def _ws_error(msg_id, op, status: int, detail) -> str:
+    return json.dumps({"id": msg_id, "op": op, "ok": False, "status": status, "error": detail}, ensure_ascii=False)
+
+async def _ws_authenticate(ws: WebSocket) -> Optional[str]:
+    # 핸드셰이크의 Authorization 헤더, 없으면 (브라우저) 첫 메시지 {"op": "auth", "token": "..."}
+    scheme, _, cred = ws.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer":
+        return _match_token(cred.strip())
+    try:
+        msg = await asyncio.wait_for(ws.receive_json(), WS_AUTH_TIMEOUT_SEC)
+    except (asyncio.TimeoutError, ValueError, KeyError, WebSocketDisconnect):
+        return None
+    key_id = _match_token(msg.get("token")) if isinstance(msg, dict) and msg.get("op") == "auth" else None
+    if key_id is not None:
+        await ws.send_text('{"op":"auth","ok":true}')
+    return key_id
+
+@app.websocket("/ws")
+async def ws_session(ws: WebSocket):
+    await ws.accept()
+    key_id = await _ws_authenticate(ws) if _KEYRING else None
+    if key_id is None:
+        await ws.close(code=1008, reason="Unauthorized")
+        return
+    session = _WSSession(key_id)
+    admission = _find_middleware(_AdmissionMW)
+    send_lock = asyncio.Lock()
+    tasks: set = set()
+
+    async def reply(text: str):
+        # 클라이언트가 먼저 끊었으면 보낼 곳이 없다 (다음 receive가 disconnect를 받는다)
+        async with send_lock:
+            try:
+                await ws.send_text(text)
+            except (WebSocketDisconnect, RuntimeError):
+                pass
+
+    async def handle(msg_id, op: str, payload, bucket, size: int):
+        # 카운터는 task가 실제로 돌기 시작할 때 올린다: 시작 전에 cancel 되면 finally 도 안 돈다
+        if bucket is not None:
+            bucket.active += 1
+        t0 = time.perf_counter()
+        try:
+            body = await _op_lane(op, local=True).run(session.run, op, payload)
+            status = 200
+            out = '{"id":%s,"op":"%s","ok":true,"result":%s}' % (json.dumps(msg_id), op, body.decode())
+        except ValidationError as e:
+            status = 422
+            out = _ws_error(msg_id, op, 422, json.loads(e.json(include_url=False, include_input=False)))
+        except HTTPException as e:
+            status = e.status_code
+            out = _ws_error(msg_id, op, e.status_code, e.detail)
+        except Exception:
+            logging.getLogger("uvicorn.error").exception("ws %s failed", op)
+            status = 500
+            out = _ws_error(msg_id, op, 500, "Internal Server Error")
+        finally:
+            if bucket is not None:
+                bucket.active -= 1
+        _METRICS.observe("/ws:" + op, "WS", status, (time.perf_counter() - t0) * 1000, size, len(out))
+        await reply(out)
+
+    try:
+        while True:
+            message = await ws.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            raw = message.get("text")
+            if raw is None:
+                data = message.get("bytes") or b""
+                size = len(data)
+                raw = data.decode("utf-8", "replace")
+            else:
+                size = len(raw) if raw.isascii() else len(raw.encode())
+            if size > WS_MAX_MESSAGE_BYTES:
+                await reply(_ws_error(None, None, 413, f"message exceeds {WS_MAX_MESSAGE_BYTES} bytes"))
+                continue
+            try:
+                msg = json.loads(raw)
+                msg_id, op = msg.get("id"), msg.get("op")
+            except (ValueError, AttributeError):
+                await reply(_ws_error(None, None, 400, "message must be a JSON object"))
+                continue
+            if not isinstance(op, str):   # list/dict op는 hash도 안 된다 → 세션 전체가 죽지 않게 여기서 거절
+                await reply(_ws_error(msg_id, None, 400, "op must be a string"))
+                continue
+            if op == "ping":
+                await reply(json.dumps({"id": msg_id, "op": "pong", "ok": True}))
+                continue
+            if op not in _WS_OPS:
+                await reply(_ws_error(msg_id, op, 400, f"unknown op (supported: {', '.join(_WS_OPS)})"))
+                continue
+            payload = msg.get("payload") or {}
+            if not isinstance(payload, dict):
+                await reply(_ws_error(msg_id, op, 400, "payload must be a JSON object"))
+                continue
+            if len(tasks) >= WS_MAX_INFLIGHT:   # 아직 시작 안 한 task 포함
+                await reply(_ws_error(msg_id, op, 429, f"more than {WS_MAX_INFLIGHT} messages in flight"))
+                continue
+            bucket = None
+            if admission is not None:
+                bucket, reason, wait = admission.admit(key_id, op)
+                if reason:
+                    await reply(_ws_error(msg_id, op, 429, {"reason": reason, "retry_after": max(1, math.ceil(wait))}))
+                    continue
+            task = asyncio.create_task(handle(msg_id, op, payload, bucket, size))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for task in tasks:
+            task.cancel()
+
+# -----------------------------
+# Static assets (openapi.json / openapi.yaml / privacy): 한 번 만들어 gzip까지 메모리에
+# -----------------------------
+class _Asset:
+    __slots__ = ("media_type", "body", "gz", "etag", "etag_gz")
+
+    def __init__(self, media_type: str, body: bytes):
+        self.media_type = media_type
+        self.body = body
+        self.gz = gzip.compress(body, compresslevel=9, mtime=0)
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        # 표현(identity/gzip)마다 다른 strong ETag
+        self.etag = f'"{digest}"'
+        self.etag_gz = f'"{digest}-gz"'
+
+_ASSETS: Optional[Dict[str, _Asset]] = None
+_ASSETS_LOCK = threading.Lock()
+
+def _build_assets() -> Dict[str, _Asset]:
+    app.openapi_schema = None
+    schema = app.openapi()
+    assets = {
+        "openapi.json": _Asset("application/json", json.dumps(
+            schema, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")),
+        "openapi.yaml": _Asset("application/yaml", yaml.safe_dump(
+            schema, sort_keys=False, allow_unicode=True).encode("utf-8")),
+    }
+    if os.path.exists("privacy.html"):
+        with open("privacy.html", "rb") as f:
+            assets["privacy"] = _Asset("text/html; charset=utf-8", f.read())
+    else:
+        assets["privacy"] = _Asset("application/json", b'{"ok":true,"privacy":"no file; default response"}')
+    return assets
+
+def reload_assets() -> Dict[str, _Asset]:
+    """스키마/privacy.html이 바뀐 뒤 호출 (POST /__assets)."""
+    global _ASSETS
+    with _ASSETS_LOCK:
+        _ASSETS = _build_assets()
+        return _ASSETS
+
+def _assets() -> Dict[str, _Asset]:
+    # 모든 라우트가 등록된 뒤여야 하므로 첫 요청에서 한 번 만든다
+    assets = _ASSETS
+    return assets if assets is not None else reload_assets()
+
+def _accepts_gzip(header: str) -> bool:
+    """Accept-Encoding에서 gzip의 q가 0보다 큰가 (gzip이 없으면 "*"의 q). q=0은 거절."""
+    q = {}
+    for item in header.lower().split(","):
+        coding, *params = (p.strip() for p in item.split(";"))
+        weight = 1.0
+        for p in params:
+            if p.startswith("q="):
+                try:
+                    weight = float(p[2:])
+                except ValueError:
+                    weight = 0.0
+        if coding:
+            q[coding] = weight
+    return q.get("gzip", q.get("x-gzip", q.get("*", 0.0))) > 0.0
+
+def _asset_response(request: Request, name: str) -> Response:
+    asset = _assets()[name]
+    use_gz = _accepts_gzip(request.headers.get("accept-encoding", ""))
+    etag = asset.etag_gz if use_gz else asset.etag
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    if use_gz:
+        headers["Content-Encoding"] = "gzip"
+        return Response(asset.gz, media_type=asset.media_type, headers=headers)
+    return Response(asset.body, media_type=asset.media_type, headers=headers)
 
 @app.get("/openapi.yaml", include_in_schema=False)
-def serve_openapi_yaml():
-    return FileResponse("openapi_local.yaml", media_type="application/yaml")
+def serve_openapi_yaml(request: Request):
+    return _asset_response(request, "openapi.yaml")
 
 
 @app.get("/openapi.json", include_in_schema=False)
-def openapi_json():
-    # 최신 스키마 강제 반영 (no-store)
-    schema = app.openapi() if hasattr(app, "openapi") else custom_openapi()
-    return JSONResponse(schema, headers={"Cache-Control": "no-store, max-age=0"})
+def openapi_json(request: Request):
+    # no-store 대신 ETag 재검증: 스키마가 바뀌면(reload) ETag도 바뀐다
+    return _asset_response(request, "openapi.json")
 
 app.openapi = custom_openapi
 
+# -----------------------------
+# Warmup (serve.py가 fork 전에 한 번)
+# -----------------------------
+STARTUP_REPORT: Dict[str, Any] = {}
+
+def warmup() -> Dict[str, float]:
+    """스키마/정적 자산, 각 op의 검증·core·직렬화 경로, 템플릿/lexicon 캐시를 미리 돌린다. 단계별 ms."""
+    out: Dict[str, float] = {}
+    t = time.perf_counter()
+    _assets()
+    out["openapi_ms"] = round((time.perf_counter() - t) * 1000, 3)
+
+    t = time.perf_counter()
+    # core를 그대로 돌리되 store에는 남기지 않는다 (공유 SQLite store에 "warmup" concept/scene이 쌓이지 않게)
+    prev, _STORE.recording = _STORE.recording, []
+    try:
+        album = {"title": "warmup", "style": "noir dream", "lyrics": "winter neon"}
+        dc = _derive_concepts_core(DeriveConceptsRequest.model_validate_json(json.dumps({"album_info": album})))
+        sel = dc.concepts[0]
+        cs = _compose_stills_core(ComposeStillsRequest(selection=sel))
+        es = _expand_scene_core(ExpandSceneRequest(brief="warmup", selection=sel))
+        results = [dc, cs, es]
+        for engine in _ENGINES:
+            results.append(_qa_validate_core(QAValidateRequest.model_validate_json(
+                json.dumps({"scene": json.loads(_dump_json(es.scene)), "engine": engine}))))
+        results.append(_generate_concepts_core(ConceptGenerateRequest(album_info=AlbumInfo(**album), limit=1)))
+        for r in results:
+            _dump_json(r)
+    finally:
+        _STORE.recording = prev
+    out["ops_ms"] = round((time.perf_counter() - t) * 1000, 3)
+    return out
+
 # -----------------------------
 # Helpers
 # -----------------------------
@@ -341,21 +2334,114 @@ def _slug(text: str) -> str:
     t = re.sub(r"[^a-zA-Z0-9\-\_]+", "-", text.strip()).strip("-").lower()
     return re.sub(r"-{2,}", "-", t)
 
+# ---- Lexicon: 가사/스타일 키워드(가중치) → palette / lighting anchors ----
+# LEXICON_PATH(기본 lexicon.json)가 없으면 아래 기본 테이블 (예전 if-chain과 같은 결과)
+DEFAULT_LEXICON: Dict[str, Any] = {
+    "palette": {
+        "default": ["muted warm neutrals", "soft beige", "charcoal"],
+        "groups": [
+            {"id": "winter", "anchors": ["silvery blue", "pearl white", "soft gray"], "keywords": {"winter": 2.0, "눈": 2.0}},
+            {"id": "neon", "anchors": ["magenta", "cyan", "deep indigo"], "keywords": {"neon": 1.0}},
+        ],
+    },
+    "lighting": {
+        "default": ["soft key", "gentle fill", "rim"],
+        "groups": [
+            {"id": "dream", "anchors": ["soft key", "gentle fill", "diffused rim"], "keywords": {"dream": 2.0}},
+            {"id": "noir", "anchors": ["hard key", "low fill", "edge rim"], "keywords": {"noir": 1.0}},
+        ],
+    },
+}
+
+class _Lexicon:
+    """모든 키워드를 Aho-Corasick 자동자 하나로: 텍스트 한 번 훑기 = O(len(text) + 매치 수), 키워드 수와 무관."""
+
+    def __init__(self, spec: Dict[str, Any]):
+        self.sections = {}
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[tuple]] = [[]]
+        for section in ("palette", "lighting"):
+            sec = spec[section]
+            groups = sec.get("groups", [])
+            self.sections[section] = (list(sec["default"]), [list(g["anchors"]) for g in groups], [g.get("id", str(i)) for i, g in enumerate(groups)])
+            for gi, g in enumerate(groups):
+                for kw, weight in g["keywords"].items():
+                    self._add(kw.lower(), (section, gi, kw.lower(), float(weight)))
+        self._link()
+
+    def _add(self, word: str, payload: tuple):
+        node = 0
+        for ch in word:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append(payload)
+
+    def _link(self):
+        queue = list(self._goto[0].values())
+        for node in queue:
+            for ch, nxt in self._goto[node].items():
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+                queue.append(nxt)
+
+    def match(self, text: str) -> Dict[str, Dict[int, float]]:
+        """section → {group index: 매치된 (서로 다른) 키워드 가중치 합}."""
+        goto, fail, out = self._goto, self._fail, self._out
+        seen = set()
+        node = 0
+        for ch in text.lower():
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                seen.update(out[node])
+        scores: Dict[str, Dict[int, float]] = {"palette": {}, "lighting": {}}
+        for section, gi, _, weight in seen:
+            scores[section][gi] = scores[section].get(gi, 0.0) + weight
+        return scores
+
+    def pick(self, section: str, scores: Dict[int, float]) -> List[str]:
+        default, anchors, _ = self.sections[section]
+        if not scores:
+            return list(default)
+        best = min(scores, key=lambda gi: (-scores[gi], gi))   # 동점이면 앞쪽 group
+        return list(anchors[best])
+
+    def options(self, section: str, scores: Dict[int, float]) -> List[List[str]]:
+        """pick()이 고르는 것부터, 나머지 group은 점수 순, 마지막에 default. (생성기의 palette/lighting 축)"""
+        default, anchors, _ = self.sections[section]
+        order = sorted(range(len(anchors)), key=lambda gi: (-scores.get(gi, 0.0), gi))
+        out = [list(anchors[gi]) for gi in order]
+        return out + [list(default)] if scores else [list(default)] + out
+
+    def select(self, text: str):
+        scores = self.match(text)
+        return self.pick("palette", scores["palette"]), self.pick("lighting", scores["lighting"])
+
+def _load_lexicon() -> _Lexicon:
+    path = os.getenv("LEXICON_PATH", "").strip() or os.path.join(os.path.dirname(os.path.abspath(__file__)), "lexicon.json")
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            return _Lexicon(json.load(f))
+    return _Lexicon(DEFAULT_LEXICON)
+
+_LEXICON = _load_lexicon()
+
 def _pick_palette(text: str):
-    t = text.lower()
-    if "winter" in t or "눈" in t:
-        return ["silvery blue", "pearl white", "soft gray"]
-    if "neon" in t:
-        return ["magenta", "cyan", "deep indigo"]
-    return ["muted warm neutrals", "soft beige", "charcoal"]
+    return _LEXICON.pick("palette", _LEXICON.match(text)["palette"])
 
 def _lighting_for_style(text: str):
-    t = text.lower()
-    if "dream" in t:
-        return ["soft key", "gentle fill", "diffused rim"]
-    if "noir" in t:
-        return ["hard key", "low fill", "edge rim"]
-    return ["soft key", "gentle fill", "rim"]
+    return _LEXICON.pick("lighting", _LEXICON.match(text)["lighting"])
 
 @app.api_route("/__diag", methods=["GET","POST","HEAD","OPTIONS"], include_in_schema=False)
 async def __diag(request: Request):
@@ -367,18 +2453,9 @@ async def __diag(request: Request):
     })
 
 
-# ---- Privacy aliases (connector safety nets) ----
-@app.get("/privacy_privacy_get", include_in_schema=False)
-def privacy_legacy_opid_alias():
-    return privacy()
-
-@app.get("/privacy/", include_in_schema=False)
-def privacy_slash_alias():
-    return privacy()
-
 @app.head("/privacy", include_in_schema=False)
-def privacy_head():
-    return JSONResponse({"ok": True})
+def privacy_head(request: Request):
+    return _asset_response(request, "privacy")
 
 
 
@@ -396,29 +2473,36 @@ def __routes():
             out.append({"path": r.path, "methods": sorted(list(r.methods)), "name": r.name})
     return {"routes": out, "app": APP_NAME, "version": "0.3.1a"}
 
-# Health alias(들)
-try:
-    app.add_api_route("/getHealth", health, methods=["GET"], include_in_schema=False)
-    app.add_api_route("/healthz", health, methods=["GET"], include_in_schema=False)
-    app.add_api_route("/health/", health, methods=["GET"], include_in_schema=False)
-except Exception:
-    pass
-
-# Privacy alias(들)
-try:
-    app.add_api_route("/getPrivacy", privacy, methods=["GET"], include_in_schema=False)
-    app.add_api_route("/privacy/", privacy, methods=["GET"], include_in_schema=False)
-except Exception:
-    pass
-
-# Snake_case ↔ kebab-case POST alias(들)
-try:
-    app.add_api_route("/derive_concepts", derive_concepts, methods=["POST"], include_in_schema=False)
-    app.add_api_route("/compose_stills", compose_stills, methods=["POST"], include_in_schema=False)
-    app.add_api_route("/expand_scene", expand_scene, methods=["POST"], include_in_schema=False)
-    app.add_api_route("/qa_validate", qa_validate, methods=["POST"], include_in_schema=False)
-except Exception:
-    pass
+# Alias(들): 라우트를 복제 등록하지 않고, 라우팅 전에 dict 한 번으로 정식 경로로 바꾼다
+_ALIASES: Dict[str, str] = {
+    "/getHealth": "/health", "/healthz": "/health", "/health/": "/health", "/health_health_get": "/health",
+    "/getPrivacy": "/privacy", "/privacy/": "/privacy", "/privacy_privacy_get": "/privacy",
+    # snake_case ↔ kebab-case
+    "/derive_concepts": "/derive-concepts", "/compose_stills": "/compose-stills",
+    "/expand_scene": "/expand-scene", "/qa_validate": "/qa-validate",
+    # opId-style fallbacks (FastAPI 기본 operationId를 경로로 쓰는 커넥터)
+    "/derive_concepts_derive_concepts_post": "/derive-concepts",
+    "/compose_stills_compose_stills_post": "/compose-stills",
+    "/expand_scene_expand_scene_post": "/expand-scene",
+    "/qa_validate_qa_validate_post": "/qa-validate",
+}
+for _alias in (x.strip() for x in os.getenv("ALIASES_DISABLED", "").split(",")):
+    _ALIASES.pop(_alias, None)
+_ALIAS_HITS: Dict[str, int] = {}
+
+class _AliasMW:
+    """Pure ASGI. 가장 바깥에서 path만 바꾸므로 admission/metrics/journal은 정식 경로로 본다."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            canonical = _ALIASES.get(scope["path"])
+            if canonical is not None:
+                _ALIAS_HITS[scope["path"]] = _ALIAS_HITS.get(scope["path"], 0) + 1
+                scope = {**scope, "path": canonical, "raw_path": canonical.encode()}
+        await self.app(scope, receive, send)
 
 # ---- Guard diagnostics ----
 def _diag_enabled():
@@ -433,30 +2517,463 @@ if "def __routes()" in globals():
         return _orig___routes()
 
 import uuid
-from starlette.middleware.base import BaseHTTPMiddleware
-class _ReqIdMW(BaseHTTPMiddleware):
-    async def dispatch(self, request, call_next):
-        rid = request.headers.get("X-Req-Id") or uuid.uuid4().hex[:16]
-        resp = await call_next(request)
-        resp.headers["X-Req-Id"] = rid
-        return resp
+from starlette.datastructures import MutableHeaders
+
+# ---- Request metrics (route별 latency histogram / status / in-flight / bytes) ----
+_LATENCY_BUCKETS_MS = (0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+class _RouteStats:
+    __slots__ = ("buckets", "count", "sum_ms", "status", "req_bytes", "resp_bytes")
+
+    def __init__(self):
+        self.buckets = [0] * (len(_LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.sum_ms = 0.0
+        self.status: Dict[int, int] = {}
+        self.req_bytes = 0
+        self.resp_bytes = 0
+
+    def add(self, ms: float):
+        i = 0
+        while i < len(_LATENCY_BUCKETS_MS) and ms > _LATENCY_BUCKETS_MS[i]:
+            i += 1
+        self.buckets[i] += 1
+        self.count += 1
+        self.sum_ms += ms
+
+    def quantile(self, q: float) -> float:
+        # bucket 경계 사이 선형 보간 (Prometheus histogram_quantile과 같은 방식)
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for i, n in enumerate(self.buckets):
+            upper = _LATENCY_BUCKETS_MS[i] if i < len(_LATENCY_BUCKETS_MS) else _LATENCY_BUCKETS_MS[-1]
+            if seen + n >= rank and n:
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+            lower = upper
+        return _LATENCY_BUCKETS_MS[-1]
+
+class _Metrics:
+    def __init__(self):
+        self.routes: Dict[tuple, _RouteStats] = {}
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def observe(self, route: str, method: str, status: int, ms: float, req_bytes: int, resp_bytes: int):
+        with self._lock:
+            st = self.routes.get((route, method))
+            if st is None:
+                st = self.routes[(route, method)] = _RouteStats()
+            st.add(ms)
+            st.status[status] = st.status.get(status, 0) + 1
+            st.req_bytes += req_bytes
+            st.resp_bytes += resp_bytes
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            routes = [
+                {"route": r, "method": m, "count": st.count, "status": dict(st.status),
+                 "p50_ms": round(st.quantile(0.50), 3), "p95_ms": round(st.quantile(0.95), 3),
+                 "p99_ms": round(st.quantile(0.99), 3), "avg_ms": round(st.sum_ms / st.count, 3) if st.count else 0.0,
+                 "req_bytes": st.req_bytes, "resp_bytes": st.resp_bytes}
+                for (r, m), st in sorted(self.routes.items())
+            ]
+        return {"in_flight": self.in_flight, "routes": routes}
+
+    def prometheus(self) -> str:
+        out = [
+            "# TYPE directoros_http_requests_in_flight gauge",
+            f"directoros_http_requests_in_flight {self.in_flight}",
+            "# TYPE directoros_http_request_duration_ms histogram",
+        ]
+        counts, req_sizes, resp_sizes = [], [], []
+        with self._lock:
+            for (r, m), st in sorted(self.routes.items()):
+                lbl = f'route="{r}",method="{m}"'
+                acc = 0
+                for i, n in enumerate(st.buckets):
+                    acc += n
+                    le = _LATENCY_BUCKETS_MS[i] if i < len(_LATENCY_BUCKETS_MS) else "+Inf"
+                    out.append(f'directoros_http_request_duration_ms_bucket{{{lbl},le="{le}"}} {acc}')
+                out.append(f"directoros_http_request_duration_ms_sum{{{lbl}}} {st.sum_ms:.3f}")
+                out.append(f"directoros_http_request_duration_ms_count{{{lbl}}} {st.count}")
+                for code, n in sorted(st.status.items()):
+                    counts.append(f'directoros_http_requests_total{{{lbl},status="{code}"}} {n}')
+                req_sizes.append(f"directoros_http_request_bytes_total{{{lbl}}} {st.req_bytes}")
+                resp_sizes.append(f"directoros_http_response_bytes_total{{{lbl}}} {st.resp_bytes}")
+        out += ["# TYPE directoros_http_requests_total counter", *counts]
+        out += ["# TYPE directoros_http_request_bytes_total counter", *req_sizes]
+        out += ["# TYPE directoros_http_response_bytes_total counter", *resp_sizes]
+        cache = _RESP_CACHE.stats()
+        for k in ("hits", "misses", "evictions", "expirations"):
+            out.append(f"# TYPE directoros_response_cache_{k}_total counter")
+            out.append(f"directoros_response_cache_{k}_total {cache[k]}")
+        out.append("# TYPE directoros_response_cache_bytes gauge")
+        out.append(f"directoros_response_cache_bytes {cache['bytes']}")
+        lanes = {k: v.stats() for k, v in sorted(_LANES.items())}
+        for k, kind in (("queued", "gauge"), ("running", "gauge"), ("completed", "counter"), ("rejected", "counter")):
+            name = f"directoros_exec_{k}" + ("_total" if kind == "counter" else "")
+            out.append(f"# TYPE {name} {kind}")
+            out += [f'{name}{{lane="{lane}"}} {st[k]}' for lane, st in lanes.items()]
+        return "\n".join(out) + "\n"
+
+_METRICS = _Metrics()
+
+def _timing(request: Request) -> Optional[Dict[str, float]]:
+    """_ReqIdMW가 scope["state"]에 심어 둔 타이밍 dict (없으면 None)."""
+    return request.scope.get("state", {}).get("timing")
+
+def _server_timing(timing: Dict[str, float], total_ms: float) -> str:
+    parts = [f"{k};dur={v:.2f}" for k, v in timing.items() if k != "t0"]
+    parts.append(f"total;dur={total_ms:.2f}")
+    return ", ".join(parts)
+
+class _ReqIdMW:
+    """Pure ASGI: X-Req-Id 부여 + Server-Timing + route별 지표 기록 (BaseHTTPMiddleware의 task/stream 래핑 없음)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        t0 = time.perf_counter()
+        rid = None
+        for k, v in scope["headers"]:
+            if k == b"x-req-id":
+                rid = v.decode("latin-1")
+                break
+        rid = rid or uuid.uuid4().hex[:16]
+        timing = {"t0": t0}
+        scope.setdefault("state", {})["timing"] = timing
+        sizes = [0, 0]
+        status = [500]
+
+        async def recv():
+            message = await receive()
+            if message["type"] == "http.request":
+                sizes[0] += len(message.get("body", b""))
+            return message
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers["X-Req-Id"] = rid
+                headers["Server-Timing"] = _server_timing(timing, (time.perf_counter() - t0) * 1000)
+            elif message["type"] == "http.response.body":
+                sizes[1] += len(message.get("body", b""))
+            await send(message)
+
+        _METRICS.in_flight += 1
+        try:
+            await self.app(scope, recv, send_wrapper)
+        finally:
+            _METRICS.in_flight -= 1
+            route = scope.get("route")
+            _METRICS.observe(
+                getattr(route, "path", "unmatched"), scope["method"], status[0],
+                (time.perf_counter() - t0) * 1000, sizes[0], sizes[1],
+            )
+
+# ---- Admission control: body 파싱/pydantic 검증 전에 429/503으로 빨리 거절 ----
+# ADMISSION_LIMITS = {"*": {...}, "<operationId>": {"rate": 초당, "burst": 버킷, "concurrency": 토큰별 동시}}
+ADMISSION_MAX_INFLIGHT = int(os.getenv("ADMISSION_MAX_INFLIGHT", "256"))
+DEFAULT_ADMISSION_LIMITS: Dict[str, Dict[str, float]] = {
+    "*": {"rate": 50, "burst": 100, "concurrency": 16},
+    "expandScene": {"rate": 10, "burst": 20, "concurrency": 4},
+    "pipelineBatch": {"rate": 2, "burst": 4, "concurrency": 2},
+    "storyboard": {"rate": 2, "burst": 4, "concurrency": 2},
+    "searchScenes": {"rate": 2, "burst": 4, "concurrency": 2},
+    "generateConceptsStream": {"rate": 2, "burst": 4, "concurrency": 2},
+}
+# 설정하면 기본값을 통째로 대체한다 ("{}" = 토큰별 제한 끔)
+ADMISSION_LIMITS: Dict[str, Dict[str, float]] = (
+    json.loads(os.environ["ADMISSION_LIMITS"]) if os.getenv("ADMISSION_LIMITS", "").strip() else DEFAULT_ADMISSION_LIMITS
+)
+
+class _TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "last", "active")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.last = time.monotonic()
+        self.active = 0
+
+    def take(self) -> float:
+        """성공이면 0, 아니면 다음 토큰까지 남은 초."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else 60.0
+
+class _AdmissionMW:
+    """Pure ASGI. 이벤트 루프 안에서만 상태를 만지므로 락 없음."""
+
+    def __init__(self, app, fastapi_app: FastAPI):
+        self.app = app
+        self.fastapi_app = fastapi_app
+        self.routes: Optional[Dict[tuple, str]] = None
+        self.buckets: Dict[tuple, _TokenBucket] = {}
+        self.in_flight = 0
+        self.shed: Dict[str, int] = {}
+
+    def _route_ops(self) -> Dict[tuple, str]:
+        # alias는 _AliasMW가 이미 정식 경로로 바꿔 둔다
+        return {(m, r.path): r.operation_id for r in self.fastapi_app.routes
+                if isinstance(r, APIRoute) and r.operation_id for m in r.methods}
+
+    def _limits(self, op: str) -> Optional[Dict[str, float]]:
+        return ADMISSION_LIMITS.get(op) or ADMISSION_LIMITS.get("*")
+
+    def admit(self, key_id: str, op: str):
+        """(bucket|None, 거절 사유|None, Retry-After 초). HTTP와 /ws 메시지가 같은 버킷을 쓴다."""
+        limits = self._limits(op)
+        if not limits:
+            return None, None, 0.0
+        bucket = self.buckets.get((key_id, op))
+        if bucket is None:
+            bucket = self.buckets[(key_id, op)] = _TokenBucket(limits.get("rate", 0), limits.get("burst", 1))
+        if limits.get("concurrency") and bucket.active >= limits["concurrency"]:
+            self.shed["too many concurrent requests"] = self.shed.get("too many concurrent requests", 0) + 1
+            return bucket, "too many concurrent requests", 1.0
+        if limits.get("rate"):
+            wait = bucket.take()
+            if wait:
+                self.shed["rate limited"] = self.shed.get("rate limited", 0) + 1
+                return bucket, "rate limited", wait
+        return bucket, None, 0.0
+
+    async def _reject(self, send, status: int, reason: str, retry_after: float):
+        if status != 429:   # 429는 admit()에서 셌다
+            self.shed[reason] = self.shed.get(reason, 0) + 1
+        body = json.dumps({"detail": reason}).encode()
+        await send({"type": "http.response.start", "status": status, "headers": [
+            (b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ]})
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in ("OPTIONS", "HEAD"):
+            return await self.app(scope, receive, send)
+        if self.routes is None:
+            self.routes = self._route_ops()
+        op = self.routes.get((scope["method"], scope["path"]))
+        if op is None:
+            return await self.app(scope, receive, send)
+
+        if ADMISSION_MAX_INFLIGHT and self.in_flight >= ADMISSION_MAX_INFLIGHT:
+            return await self._reject(send, 503, "overloaded", 1)
+
+        auth = b""
+        for k, v in scope["headers"]:
+            if k == b"authorization":
+                auth = v
+                break
+        scheme, _, cred = auth.decode("latin-1").partition(" ")
+        key_id = _match_token(cred.strip()) if scheme.lower() == "bearer" else None
+        bucket = None
+        if key_id is not None:   # 인증 실패는 require_bearer가 401로 처리
+            bucket, reason, wait = self.admit(key_id, op)
+            if reason:
+                return await self._reject(send, 429, reason, wait)
+
+        self.in_flight += 1
+        if bucket is not None:
+            bucket.active += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+            if bucket is not None:
+                bucket.active -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight, "max_in_flight": ADMISSION_MAX_INFLIGHT, "limits": ADMISSION_LIMITS,
+            "shed": dict(self.shed),
+            "keys": [{"key": k, "op": op, "tokens": round(b.tokens, 2), "active": b.active}
+                     for (k, op), b in sorted(self.buckets.items())],
+        }
+
+app.add_middleware(_AdmissionMW, fastapi_app=app)
+# CORS는 admission 바깥: shed된 429/503에도 CORS 헤더가 붙어야 브라우저가 opaque 에러 대신 재시도할 수 있다
+app.add_middleware(CORSMiddleware, allow_origins=allowlist,
+    allow_credentials=False,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
 app.add_middleware(_ReqIdMW)
 
 
-# ---- Compatibility aliases for quirky connectors ----
-try:
-    app.add_api_route("/health_health_get", health, methods=["GET"], include_in_schema=False)
-    app.add_api_route("/privacy_privacy_get", privacy, methods=["GET"], include_in_schema=False)
-except Exception:
-    pass
-# POST opId-style fallbacks
-try:
-    app.add_api_route("/derive_concepts_derive_concepts_post", derive_concepts, methods=["POST"], include_in_schema=False)
-    app.add_api_route("/compose_stills_compose_stills_post", compose_stills, methods=["POST"], include_in_schema=False)
-    app.add_api_route("/expand_scene_expand_scene_post", expand_scene, methods=["POST"], include_in_schema=False)
-    app.add_api_route("/qa_validate_qa_validate_post", qa_validate, methods=["POST"], include_in_schema=False)
-except Exception:
-    pass
+# ---- Request journal (opt-in: JOURNAL_DIR) ----
+# 요청/응답 쌍을 메모리 큐에 넣고, 백그라운드 task가 배치로 파일에 쓴다 (요청은 디스크를 기다리지 않음)
+JOURNAL_DIR = os.getenv("JOURNAL_DIR", "").strip()
+JOURNAL_OPS = {x.strip() for x in os.getenv("JOURNAL_OPS", "").split(",") if x.strip()}
+JOURNAL_MAX_BODY_BYTES = int(os.getenv("JOURNAL_MAX_BODY_BYTES", str(64 << 10)))
+JOURNAL_ROTATE_BYTES = int(os.getenv("JOURNAL_ROTATE_BYTES", str(64 << 20)))
+JOURNAL_KEEP = int(os.getenv("JOURNAL_KEEP", "20"))
+_JOURNAL_HEADERS = {"content-type", "user-agent", "x-req-id", "if-none-match", "accept", "accept-encoding"}
+
+class _Journal:
+    def __init__(self, directory: str, batch: int = 500, interval: float = 1.0, queue_max: int = 10000):
+        self.dir = directory
+        self.batch = batch
+        self.interval = interval
+        self.queue_max = queue_max
+        self.path = os.path.join(directory, f"journal.{os.getpid()}.jsonl")
+        self.queue: Optional[asyncio.Queue] = None
+        self.task: Optional[asyncio.Task] = None
+        self.written = self.dropped = self.rotations = 0
+
+    def start(self):
+        if self.task is None:
+            os.makedirs(self.dir, exist_ok=True)
+            self.path = os.path.join(self.dir, f"journal.{os.getpid()}.jsonl")   # fork 후 worker마다 따로
+            self.queue = asyncio.Queue(self.queue_max)
+            self.task = asyncio.get_running_loop().create_task(self._run())
+
+    def submit(self, record: Dict[str, Any]):
+        if self.queue is None:
+            self.start()
+        try:
+            self.queue.put_nowait(record)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def _run(self):
+        stop = False
+        while not stop:
+            items = [await self.queue.get()]
+            if self.queue.qsize() < self.batch and items[0] is not None:
+                await asyncio.sleep(self.interval)   # 모아서 한 번에
+            while len(items) <= self.batch and not self.queue.empty():
+                items.append(self.queue.get_nowait())
+            if None in items:   # close()가 넣은 종료 표시
+                stop = True
+                items = [r for r in items if r is not None]
+            if items:
+                await asyncio.to_thread(self._write, items)
+
+    def _write(self, items: List[Dict[str, Any]]):
+        data = "".join(json.dumps(r, ensure_ascii=False, separators=(",", ":")) + "\n" for r in items).encode()
+        with open(self.path, "ab") as f:
+            f.write(data)
+            size = f.tell()
+        self.written += len(items)
+        if size >= JOURNAL_ROTATE_BYTES:
+            self._rotate()
+
+    def _rotate(self):
+        rotated = self.path[: -len(".jsonl")] + time.strftime(".%Y%m%d-%H%M%S") + f"-{self.rotations}.jsonl.gz"
+        with open(self.path, "rb") as src, gzip.open(rotated, "wb") as dst:
+            while chunk := src.read(1 << 20):
+                dst.write(chunk)
+        os.remove(self.path)
+        self.rotations += 1
+        for old in sorted(glob.glob(os.path.join(self.dir, "journal.*.jsonl.gz")), key=os.path.getmtime)[:-JOURNAL_KEEP]:
+            os.remove(old)
+
+    async def close(self):
+        if self.task is None:
+            return
+        await self.queue.put(None)
+        await self.task
+        self.task = None
+        self.queue = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"path": self.path, "queued": self.queue.qsize() if self.queue else 0,
+                "written": self.written, "dropped": self.dropped, "rotations": self.rotations}
+
+def _journal_body(raw: bytes, truncated: bool) -> Dict[str, Any]:
+    if truncated:
+        return {"body_text": raw.decode("utf-8", "replace"), "truncated": True}
+    if not raw:
+        return {}
+    try:
+        return {"body": json.loads(raw)}
+    except ValueError:
+        return {"body_text": raw.decode("utf-8", "replace")}
+
+class _JournalMW:
+    """요청/응답 본문을 (JOURNAL_MAX_BODY_BYTES까지) 복사해 _Journal 큐로. Authorization 등 민감 헤더는 버린다."""
+
+    def __init__(self, app, journal: _Journal):
+        self.app = app
+        self.journal = journal
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            async def lifespan_receive():
+                message = await receive()
+                if message["type"] == "lifespan.shutdown":
+                    await self.journal.close()
+                return message
+            return await self.app(scope, lifespan_receive, send)
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        limit = JOURNAL_MAX_BODY_BYTES
+        req, resp = bytearray(), bytearray()
+        cut = [False, False]
+        status = [0]
+        rid = [None]
+        t0 = time.time()
+
+        async def recv():
+            message = await receive()
+            if message["type"] == "http.request" and not cut[0]:
+                req.extend(message.get("body", b""))
+                if len(req) > limit:
+                    del req[limit:]
+                    cut[0] = True
+            return message
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                for k, v in message.get("headers", []):
+                    if k.lower() == b"x-req-id":
+                        rid[0] = v.decode("latin-1")
+            elif message["type"] == "http.response.body" and not cut[1]:
+                resp.extend(message.get("body", b""))
+                if len(resp) > limit:
+                    del resp[limit:]
+                    cut[1] = True
+            await send(message)
+
+        try:
+            await self.app(scope, recv, send_wrapper)
+        finally:
+            op = getattr(scope.get("route"), "operation_id", None)
+            if op and (not JOURNAL_OPS or op in JOURNAL_OPS):
+                headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope["headers"]}
+                self.journal.submit({
+                    "ts": round(t0, 3), "req_id": rid[0], "op": op, "method": scope["method"], "path": scope["path"],
+                    "query": scope.get("query_string", b"").decode("latin-1"), "status": status[0],
+                    "duration_ms": round((time.time() - t0) * 1000, 3),
+                    "headers": {k: v for k, v in headers.items() if k in _JOURNAL_HEADERS},
+                    "request": _journal_body(bytes(req), cut[0]),
+                    "response": _journal_body(bytes(resp), cut[1]),
+                })
+
+_JOURNAL = _Journal(JOURNAL_DIR) if JOURNAL_DIR else None
+if _JOURNAL is not None:
+    app.add_middleware(_JournalMW, journal=_JOURNAL)
+
+
+# alias 정규화는 가장 바깥 (다른 middleware보다 나중에 추가)
+app.add_middleware(_AliasMW)
 
 
 
@@ -466,8 +2983,8 @@ from starlette.exceptions import HTTPException as StarletteHTTPException
 
 @app.exception_handler(StarletteHTTPException)
 async def _not_found_handler(request: Request, exc: StarletteHTTPException):
-    if exc.status_code != 404:
-        return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail})
+    if exc.status_code != 404 or exc.detail != "Not Found":
+        return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail}, headers=exc.headers)
     return JSONResponse(
         status_code=404,
         content={
@@ -488,6 +3005,13 @@ def _diag_enabled_request(request: Request):
     qp = request.query_params.get("diag") or request.query_params.get("__diag")
     return (request.headers.get("X-Diag")=="1" or (qp and qp.lower() in ("1","true","yes")))
 
+async def require_diag(credentials: HTTPAuthorizationCredentials = Security(security)):
+    """운영 diag (metrics, cache, profile …): ENABLE_DIAG=1 일 때만 있고 bearer가 필요하다.
+    ?diag=1 / X-Diag 우회는 예전 읽기 전용 __routes_open 에만 남긴다."""
+    if not _diag_enabled_env():
+        raise HTTPException(status_code=404, detail="Not Found")
+    return await require_bearer(credentials)
+
 @app.get("/__routes_open", include_in_schema=False)
 def __routes_open(request: Request):
     if not (_diag_enabled_env() or _diag_enabled_request(request)):
@@ -498,3 +3022,458 @@ def __routes_open(request: Request):
             out.append({"path": r.path, "methods": sorted(list(r.methods)), "name": r.name})
     return {"routes": out, "app": APP_NAME, "version": "0.3.1a"}
 
+
+
+@app.get("/__qa_rules", include_in_schema=False)
+def __qa_rules(_: bool = Security(require_diag)):
+    return {"rules": _qa_rules_stats()}
+
+@app.post("/__qa_rules", include_in_schema=False)
+async def __qa_rules_reload(request: Request, _: bool = Security(require_diag)):
+    """본문 없음 → QA_RULES_PATH(또는 기본 테이블) 재로딩; {"rules": [...]} → 테이블 교체; {"disabled": [...]} → on/off만."""
+    global _QA_RULES, _QA_RULES_VERSION
+    body = await request.body()
+    try:
+        data = json.loads(body) if body.strip() else {}
+        if "disabled" in data and "rules" not in data:
+            off = set(data["disabled"])
+            for r in _QA_RULES:
+                r.enabled = r.id not in off
+        else:
+            _QA_RULES = _load_qa_rules(data.get("rules"))
+        _QA_RULES_VERSION += 1
+        _RESP_CACHE.clear()
+    except (KeyError, TypeError, ValueError, re.error) as e:
+        raise HTTPException(status_code=400, detail=f"invalid rules: {e}")
+    return {"rules": _qa_rules_stats()}
+
+@app.get("/__cache", include_in_schema=False)
+def __cache(_: bool = Security(require_diag)):
+    return {"response_cache": _RESP_CACHE.stats(), "object_store": _STORE.stats()}
+
+@app.delete("/__cache", include_in_schema=False)
+def __cache_clear(_: bool = Security(require_diag)):
+    _RESP_CACHE.clear()
+    return {"response_cache": _RESP_CACHE.stats()}
+
+@app.get("/metrics", include_in_schema=False)
+def metrics(request: Request, _: bool = Security(require_diag)):
+    if request.query_params.get("format") == "json":
+        return {"http": _METRICS.snapshot(), "response_cache": _RESP_CACHE.stats(), "exec": _exec_stats(),
+                "startup": STARTUP_REPORT or None}
+    return Response(_METRICS.prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/__journal", include_in_schema=False)
+def __journal(_: bool = Security(require_diag)):
+    return {"journal": _JOURNAL.stats() if _JOURNAL is not None else None}
+
+@app.get("/__admission", include_in_schema=False)
+def __admission(_: bool = Security(require_diag)):
+    mw = _find_middleware(_AdmissionMW)
+    return {"admission": mw.stats() if mw is not None else None, "keys": sorted(_KEYRING)}
+
+@app.get("/__exec", include_in_schema=False)
+def __exec(_: bool = Security(require_diag)):
+    """op별 실행 정책과 lane별 대기열/실행 시간 (lane은 처음 쓰일 때 생긴다)."""
+    return {"exec": _exec_stats(), "pools": EXEC_POOLS}
+
+def _find_middleware(cls):
+    node = app.middleware_stack
+    while node is not None:
+        if isinstance(node, cls):
+            return node
+        node = getattr(node, "app", None)
+    return None
+
+@app.get("/__aliases", include_in_schema=False)
+def __aliases(_: bool = Security(require_diag)):
+    """alias별 hit 수 (프로세스 시작 이후). 0으로 남는 alias는 ALIASES_DISABLED로 끄고 지켜본 뒤 삭제."""
+    return {"aliases": [{"alias": k, "canonical": v, "hits": _ALIAS_HITS.get(k, 0)} for k, v in sorted(_ALIASES.items())],
+            "disabled": sorted(x.strip() for x in os.getenv("ALIASES_DISABLED", "").split(",") if x.strip())}
+
+@app.get("/__assets", include_in_schema=False)
+def __assets(_: bool = Security(require_diag)):
+    return {"assets": {k: {"media_type": v.media_type, "bytes": len(v.body), "gzip_bytes": len(v.gz), "etag": v.etag}
+                       for k, v in _assets().items()}}
+
+@app.post("/__assets", include_in_schema=False)
+def __assets_reload(_: bool = Security(require_diag)):
+    return {"reloaded": {k: v.etag for k, v in reload_assets().items()}}
+
+# ---- Profiling (diag): 재배포 없이 운영 트래픽 그대로, op 하나의 다음 N개 요청 / T초 ----
+# POST /__profile {"op": "expandScene", "mode": "cprofile"|"sample", "requests": 100, "seconds": 60,
+#                  "interval_ms": 5, "tracemalloc": false, "frames": 1}   (op 생략 = 모든 op)
+# GET /__profile (상태) · /__profile/report?sort=cumulative&limit=40 (텍스트) · /__profile/download?kind=...
+# 잰 구간: op 정책의 lane(inline/thread)에서 도는 계산 + NDJSON 응답 본문 생성 + /ws 메시지의 core 호출.
+# process lane에서 도는 계산은 worker process 안이라 잡히지 않는다. 상태는 process(serve.py worker)별.
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "600"))
+PROFILE_MAX_REQUESTS = int(os.getenv("PROFILE_MAX_REQUESTS", "10000"))
+
+_PROFILE_CLAIM: "contextvars.ContextVar[Optional[_ProfileSession]]" = contextvars.ContextVar("profile_claim", default=None)
+
+_TRACEMALLOC_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, pstats.__file__),
+    tracemalloc.Filter(False, cProfile.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+def _tracemalloc_snapshot() -> tracemalloc.Snapshot:
+    return tracemalloc.take_snapshot().filter_traces(_TRACEMALLOC_FILTERS)
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class _ProfileSession:
+    """한 번의 측정 창. cprofile: 구간마다 cProfile → pstats로 합침. sample: 구간을 도는 스레드의 stack을 주기적으로 센다."""
+
+    def __init__(self, op: Optional[str], mode: str, requests: int, seconds: float, interval_ms: float,
+                 trace_malloc: bool, frames: int):
+        self.op, self.mode, self.requests, self.seconds = op, mode, requests, seconds
+        self.interval = interval_ms / 1000
+        self.trace_malloc, self.frames = trace_malloc, frames
+        self.active = True
+        self.started = time.time()
+        self.t0 = time.monotonic()
+        self.ended: Optional[float] = None
+        self.claimed = 0
+        self.completed = 0
+        self.stats: Optional[pstats.Stats] = None
+        self.samples: Dict[tuple, int] = {}
+        self.sample_ticks = 0
+        self.threads: Dict[int, int] = {}
+        self.snap_before: Optional[tracemalloc.Snapshot] = None
+        self.snap_after: Optional[tracemalloc.Snapshot] = None
+        self.owns_tracemalloc = False
+        self.timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+
+    def claim(self, op: str) -> bool:
+        if not self.active or (self.op and self.op != op):
+            return False
+        with self._lock:
+            if self.claimed >= self.requests:
+                return False
+            self.claimed += 1
+            return True
+
+    def _merge(self, prof: cProfile.Profile):
+        with self._lock:
+            if self.stats is None:
+                self.stats = pstats.Stats(prof)
+            else:
+                self.stats.add(prof)
+
+    def _enter(self):
+        tid = threading.get_ident()
+        with self._lock:
+            self.threads[tid] = self.threads.get(tid, 0) + 1
+
+    def _leave(self):
+        tid = threading.get_ident()
+        with self._lock:
+            n = self.threads.get(tid, 1) - 1
+            if n:
+                self.threads[tid] = n
+            else:
+                self.threads.pop(tid, None)
+
+    def measure(self, fn, *args, **kwargs):
+        if self.mode == "sample":
+            self._enter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._leave()
+        if sys.getprofile() is not None:   # 이 스레드에 이미 켜진 profiler (겹친 구간)
+            return fn(*args, **kwargs)
+        prof = cProfile.Profile()
+        try:
+            return prof.runcall(fn, *args, **kwargs)
+        finally:
+            self._merge(prof)
+
+    def sample_loop(self):
+        me = threading.get_ident()
+        while self.active:
+            time.sleep(self.interval)
+            with self._lock:
+                tids = [t for t in self.threads if t != me]
+            if not tids:
+                continue
+            frames = sys._current_frames()
+            with self._lock:
+                self.sample_ticks += 1
+                for tid in tids:
+                    f = frames.get(tid)
+                    stack = []
+                    while f is not None:
+                        stack.append(_frame_label(f.f_code))
+                        f = f.f_back
+                    if stack:
+                        key = tuple(reversed(stack))
+                        self.samples[key] = self.samples.get(key, 0) + 1
+
+    def status(self) -> Dict[str, Any]:
+        elapsed = (self.ended or time.time()) - self.started
+        return {"op": self.op, "mode": self.mode, "state": "running" if self.active else "done",
+                "requests": self.requests, "claimed": self.claimed, "completed": self.completed,
+                "seconds": self.seconds, "elapsed_sec": round(elapsed, 3),
+                "samples": sum(self.samples.values()) if self.mode == "sample" else None,
+                "tracemalloc": self.trace_malloc}
+
+    def report(self, sort: str, limit: int) -> str:
+        st = self.status()
+        out = io.StringIO()
+        out.write(f"op={st['op'] or '*'} mode={self.mode} state={st['state']} completed={self.completed}/{self.requests} "
+                  f"elapsed={st['elapsed_sec']}s\n\n")
+        with self._lock:
+            if self.mode == "cprofile":
+                if self.stats is None:
+                    out.write("(no profiled calls yet)\n")
+                else:
+                    self.stats.stream = out
+                    self.stats.sort_stats(sort).print_stats(limit)
+            else:
+                self._sample_report(out, limit)
+        if self.trace_malloc:
+            out.write("\n--- tracemalloc (after - before, by line) ---\n")
+            if self.snap_before is None or self.snap_after is None:
+                out.write("(available when the session is done)\n")
+            else:
+                for d in self.snap_after.compare_to(self.snap_before, "lineno")[:limit]:
+                    out.write(f"{d}\n")
+        return out.getvalue()
+
+    def _sample_report(self, out, limit: int):
+        total = sum(self.samples.values())
+        if not total:
+            out.write("(no samples yet)\n")
+            return
+        own: Dict[str, int] = {}
+        incl: Dict[str, int] = {}
+        for stack, n in self.samples.items():
+            own[stack[-1]] = own.get(stack[-1], 0) + n
+            for label in set(stack):
+                incl[label] = incl.get(label, 0) + n
+        out.write(f"{total} samples every {self.interval * 1000:g} ms\n\n{'own':>8}{'incl':>8}  function\n")
+        for label, n in sorted(incl.items(), key=lambda kv: (-own.get(kv[0], 0), -kv[1]))[:limit]:
+            out.write(f"{own.get(label, 0) / total:>8.1%}{n / total:>8.1%}  {label}\n")
+
+    def collapsed(self) -> bytes:
+        # flamegraph.pl / speedscope 가 읽는 "a;b;c count" 형식
+        with self._lock:
+            lines = [f"{';'.join(stack)} {n}" for stack, n in sorted(self.samples.items(), key=lambda kv: -kv[1])]
+        return ("\n".join(lines) + "\n").encode()
+
+class _Profiler:
+    def __init__(self):
+        self.session: Optional[_ProfileSession] = None
+        self._lock = threading.Lock()
+
+    def start(self, spec: Dict[str, Any]) -> _ProfileSession:
+        mode = spec.get("mode", "cprofile")
+        if mode not in ("cprofile", "sample"):
+            raise ValueError("mode must be 'cprofile' or 'sample'")
+        op = spec.get("op") or None
+        if op is not None and op not in _profile_ops():
+            raise ValueError(f"unknown op: {op}")
+        s = _ProfileSession(
+            op, mode,
+            requests=max(1, min(int(spec.get("requests", 100)), PROFILE_MAX_REQUESTS)),
+            seconds=max(0.1, min(float(spec.get("seconds", 60)), PROFILE_MAX_SECONDS)),
+            interval_ms=max(1.0, float(spec.get("interval_ms", 5))),
+            trace_malloc=bool(spec.get("tracemalloc", False)),
+            frames=max(1, min(int(spec.get("frames", 1)), 50)),
+        )
+        with self._lock:
+            if self.session is not None and self.session.active:
+                raise RuntimeError("a profiling session is already running")
+            if s.trace_malloc:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start(s.frames)
+                    s.owns_tracemalloc = True
+                s.snap_before = _tracemalloc_snapshot()
+            self.session = s
+        if mode == "sample":
+            threading.Thread(target=s.sample_loop, name="profile-sampler", daemon=True).start()
+        s.timer = threading.Timer(s.seconds, self.finish, args=(s,))
+        s.timer.daemon = True
+        s.timer.start()
+        return s
+
+    def finish(self, s: Optional[_ProfileSession] = None) -> Optional[_ProfileSession]:
+        with self._lock:
+            s = s or self.session
+            if s is None or not s.active:
+                return s
+            s.active = False
+            s.ended = time.time()
+        if s.timer is not None:
+            s.timer.cancel()
+        if s.trace_malloc:
+            s.snap_after = _tracemalloc_snapshot()
+            if s.owns_tracemalloc:
+                tracemalloc.stop()
+        return s
+
+    def claim(self, op: str) -> Optional[_ProfileSession]:
+        s = self.session
+        if s is None or not s.active:
+            return None
+        return s if s.claim(op) else None
+
+    def release(self, s: _ProfileSession):
+        with s._lock:
+            s.completed += 1
+            done = s.completed >= s.requests
+        if done:
+            self.finish(s)
+
+    def run(self, op: str, fn, *args, **kwargs):
+        s = self.claim(op)
+        if s is None:
+            return fn(*args, **kwargs)
+        try:
+            return s.measure(fn, *args, **kwargs)
+        finally:
+            self.release(s)
+
+_PROFILER = _Profiler()
+
+def _profile_ops() -> set:
+    return {r.operation_id for r in app.routes if isinstance(r, APIRoute) and r.operation_id} | set(_WS_OPS)
+
+def _profiled_iter(s: _ProfileSession, it):
+    """NDJSON 본문 생성기(sync): next() 마다 잰다 (threadpool 어느 스레드에서 돌든)."""
+    it = iter(it)
+    while True:
+        try:
+            yield s.measure(next, it)
+        except StopIteration:
+            return
+
+async def _profiled_body(s: _ProfileSession, body):
+    try:
+        async for chunk in body:
+            yield chunk
+    finally:
+        _PROFILER.release(s)
+
+def _profiled_response(s: _ProfileSession, res):
+    # streaming 응답은 본문을 다 보낸 뒤에 요청 하나로 센다
+    if isinstance(res, StreamingResponse):
+        res.body_iterator = _profiled_body(s, res.body_iterator)
+    else:
+        _PROFILER.release(s)
+    return res
+
+def _profiled_endpoint(op: str, call):
+    if asyncio.iscoroutinefunction(call):
+        @functools.wraps(call)
+        async def endpoint(**kwargs):
+            s = _PROFILER.claim(op)
+            if s is None:
+                return await call(**kwargs)
+            token = _PROFILE_CLAIM.set(s)
+            try:
+                res = await call(**kwargs)   # 계산은 lane.run 이 그 스레드에서 잰다
+            except BaseException:
+                _PROFILER.release(s)
+                raise
+            finally:
+                _PROFILE_CLAIM.reset(token)
+            return _profiled_response(s, res)
+    else:
+        @functools.wraps(call)
+        def endpoint(**kwargs):
+            s = _PROFILER.claim(op)
+            if s is None:
+                return call(**kwargs)
+            token = _PROFILE_CLAIM.set(s)
+            try:
+                res = s.measure(call, **kwargs)
+            except BaseException:
+                _PROFILER.release(s)
+                raise
+            finally:
+                _PROFILE_CLAIM.reset(token)
+            return _profiled_response(s, res)
+    endpoint.profiled = True
+    return endpoint
+
+def _instrument_routes():
+    # 라우트 구성 이후 endpoint 호출만 감싼다 (꺼져 있을 때 비용: session is None 확인 한 번)
+    for r in app.routes:
+        if isinstance(r, APIRoute) and r.operation_id and not getattr(r.dependant.call, "profiled", False):
+            r.dependant.call = _profiled_endpoint(r.operation_id, r.dependant.call)
+
+_instrument_routes()
+
+@app.get("/__profile", include_in_schema=False)
+def __profile(_: bool = Security(require_diag)):
+    s = _PROFILER.session
+    return {"session": s.status() if s is not None else None, "ops": sorted(_profile_ops())}
+
+@app.post("/__profile", include_in_schema=False)
+async def __profile_start(request: Request, _: bool = Security(require_diag)):
+    body = await request.body()
+    try:
+        spec = json.loads(body) if body.strip() else {}
+        if not isinstance(spec, dict):
+            raise ValueError("body must be a JSON object")
+        s = _PROFILER.start(spec)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"invalid profile spec: {e}")
+    return {"session": s.status()}
+
+@app.delete("/__profile", include_in_schema=False)
+def __profile_stop(_: bool = Security(require_diag)):
+    s = _PROFILER.finish()
+    return {"session": s.status() if s is not None else None}
+
+@app.get("/__profile/report", include_in_schema=False)
+def __profile_report(request: Request, _: bool = Security(require_diag)):
+    s = _PROFILER.session
+    if s is None:
+        raise HTTPException(status_code=404, detail="no profiling session")
+    try:
+        limit = max(1, int(request.query_params.get("limit", "40")))
+        text = s.report(request.query_params.get("sort", "cumulative"), limit)
+    except (KeyError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"invalid sort/limit: {e}")
+    return Response(text, media_type="text/plain; charset=utf-8")
+
+@app.get("/__profile/download", include_in_schema=False)
+def __profile_download(request: Request, _: bool = Security(require_diag)):
+    """kind=stats → cprofile: pstats 파일 (pstats.Stats / snakeviz), sample: collapsed stacks (flamegraph);
+    kind=tracemalloc_before | tracemalloc_after → tracemalloc.Snapshot.load 로 읽는 파일."""
+    s = _PROFILER.session
+    if s is None:
+        raise HTTPException(status_code=404, detail="no profiling session")
+    kind = request.query_params.get("kind", "stats")
+    stem = f"profile-{s.op or 'all'}-{int(s.started)}"
+    if kind == "stats" and s.mode == "sample":
+        data, name = s.collapsed(), f"{stem}.collapsed.txt"
+    elif kind == "stats":
+        with s._lock:
+            if s.stats is None:
+                raise HTTPException(status_code=409, detail="no profiled calls yet")
+            data = marshal.dumps(s.stats.stats)
+        name = f"{stem}.pstats"
+    elif kind in ("tracemalloc_before", "tracemalloc_after"):
+        snap = s.snap_before if kind == "tracemalloc_before" else s.snap_after
+        if snap is None:
+            raise HTTPException(status_code=409, detail=f"{kind} snapshot not available")
+        with tempfile.NamedTemporaryFile(suffix=".tracemalloc") as f:
+            snap.dump(f.name)
+            data = f.read()
+        name = f"{stem}.{kind}.tracemalloc"
+    else:
+        raise HTTPException(status_code=400, detail="kind must be stats, tracemalloc_before or tracemalloc_after")
+    return Response(data, media_type="application/octet-stream",
+                    headers={"Content-Disposition": f'attachment; filename="{name}"'})
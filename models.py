@@ -1,8 +1,8 @@
 # models.py
 from __future__ import annotations
 
-from typing import List, Optional, Literal, Dict, Any
-from pydantic import BaseModel, Field
+from typing import Any, ClassVar, Dict, List, Literal, Optional, Union
+from pydantic import BaseModel, ConfigDict, Field, StrictFloat, StrictInt, StrictStr, ValidationInfo, model_validator
 
 
 # -----------------------------
@@ -40,9 +40,34 @@ class DeriveConceptsResponse(BaseModel):
 
 
 class ComposeStillsRequest(BaseModel):
-    selection: Concept
+    selection: Optional[Concept] = None
+    selection_ref: Optional[str] = Field(default=None, description="Concept.id returned by deriveConcepts (instead of the inline selection)")
     count: int = Field(3, ge=1, le=6)
 
+    @model_validator(mode="after")
+    def _need_selection(self):
+        if self.selection is None and not self.selection_ref:
+            raise ValueError("selection or selection_ref is required")
+        return self
+
+
+class ConceptGenerateRequest(BaseModel):
+    album_info: AlbumInfo
+    controls: Optional[Controls] = Field(default=None, description="palette/lighting overrides pin that axis; variants is ignored")
+    seed: int = Field(default=0, ge=0, le=2**31 - 1, description="same seed + cursor always returns the same page")
+    cursor: Optional[str] = Field(default=None, description="next_cursor from the previous page (omit for the first page)")
+    limit: int = Field(default=20, ge=1, le=200)
+
+
+class ConceptStreamRequest(ConceptGenerateRequest):
+    limit: int = Field(default=1000, ge=1, le=10000)
+
+
+class ConceptPage(BaseModel):
+    concepts: List[Concept]
+    total: int = Field(description="size of the whole variant space for this album/seed")
+    next_cursor: Optional[str] = None
+
 
 class MJPrompt(BaseModel):
     id: str
@@ -57,11 +82,18 @@ class ComposeStillsResponse(BaseModel):
 
 class ExpandSceneRequest(BaseModel):
     brief: str
-    selection: Concept
+    selection: Optional[Concept] = None
+    selection_ref: Optional[str] = Field(default=None, description="Concept.id returned by deriveConcepts (instead of the inline selection)")
     image_url: Optional[str] = None
     duration_sec: float = 3.0
     beats: int = Field(default=5, ge=1, le=12)
 
+    @model_validator(mode="after")
+    def _need_selection(self):
+        if self.selection is None and not self.selection_ref:
+            raise ValueError("selection or selection_ref is required")
+        return self
+
 
 class TimelineBeat(BaseModel):
     t: float
@@ -69,10 +101,131 @@ class TimelineBeat(BaseModel):
     intensity: float = Field(ge=0.0, le=1.0)
 
 
+# -----------------------------
+# Scene blocks (ST / DS / DW)
+# -----------------------------
+# 알려진 필드는 strict 타입. 예전 Dict[str, Any] 모양은 _legacy_adapter가 (strict 모드가 아니면) 맞춰 준다.
+# 모르는 키는 extra로 그대로 보존되고, None 필드는 직렬화하지 않는다 (예전 dict와 같은 JSON).
+_SCENE_STRICT = False
+
+def set_scene_strict(flag: bool) -> None:
+    """True면 어댑터 없이 검증: 타입이 안 맞는 scene은 점수 계산 전에 422."""
+    global _SCENE_STRICT
+    _SCENE_STRICT = bool(flag)
+
+def _strict(info: ValidationInfo) -> bool:
+    # 서버 전체(SCENE_STRICT) 또는 호출 단위 model_validate(..., context={"strict": True})
+    return _SCENE_STRICT or bool((info.context or {}).get("strict"))
+
+def _unset(v) -> bool:
+    return v is None
+
+_Number = Union[StrictInt, StrictFloat]
+
+
+def _legacy_number(v: Any, parse: bool) -> Any:
+    # 예전 dict 값 그대로: bool은 (isinstance(int) 였던 대로) 숫자, 숫자 문자열은 parse 일 때만 float,
+    # 그 밖의 모양(list/dict …)은 문자열로. 숫자가 아닌 값은 비교 rule에 안 걸리고 not_number에만 걸린다
+    if v is None or isinstance(v, (int, float, str)) and not isinstance(v, bool):
+        if parse and isinstance(v, str):
+            try:
+                return float(v)
+            except ValueError:
+                return v
+        return v
+    if isinstance(v, bool):
+        return int(v)
+    return str(v)
+
+
+class _SceneBlock(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    TEXT_FIELDS: ClassVar[tuple] = ()
+    NUMBER_FIELDS: ClassVar[tuple] = ()   # strict: 숫자만. 아니면 숫자 문자열은 float, 나머지는 문자열로 보존
+    SCALAR_FIELDS: ClassVar[tuple] = ()   # 숫자 또는 문자열 그대로 (lens_mm: 문자열이면 focal rule이 잡는다)
+
+    @model_validator(mode="before")
+    @classmethod
+    def _legacy_adapter(cls, data: Any, info: ValidationInfo):
+        if not isinstance(data, dict) or _strict(info):
+            return data
+        out = dict(data)
+        for k in cls.TEXT_FIELDS:
+            v = out.get(k)
+            if v is None or isinstance(v, str):
+                continue
+            out[k] = ", ".join(str(x) for x in v) if isinstance(v, (list, tuple)) else str(v)
+        for k in cls.NUMBER_FIELDS:
+            if k in out:
+                out[k] = _legacy_number(out[k], parse=True)
+        for k in cls.SCALAR_FIELDS:
+            if k in out:
+                out[k] = _legacy_number(out[k], parse=False)
+        return out
+
+    @model_validator(mode="after")
+    def _strict_numbers(self, info: ValidationInfo):
+        if _strict(info):
+            for k in self.NUMBER_FIELDS:
+                if isinstance(getattr(self, k), str):
+                    raise ValueError(f"{k} must be a number in strict mode")
+        return self
+
+
+class SceneST(_SceneBlock):
+    TEXT_FIELDS = ("ar", "framing", "dof")
+    NUMBER_FIELDS = ("digital_crop_pct",)
+    SCALAR_FIELDS = ("lens_mm",)
+
+    ar: Optional[StrictStr] = Field(default=None, exclude_if=_unset)
+    framing: Optional[StrictStr] = Field(default=None, exclude_if=_unset)
+    lens_mm: Optional[Union[_Number, StrictStr]] = Field(default=None, exclude_if=_unset, description="focal length; must be a number in strict mode")
+    dof: Optional[StrictStr] = Field(default=None, exclude_if=_unset)
+    base_lighting: Optional[List[StrictStr]] = Field(default=None, exclude_if=_unset)
+    digital_crop_pct: Optional[Union[_Number, StrictStr]] = Field(default=None, exclude_if=_unset, description="must be a number in strict mode")
+
+    @model_validator(mode="before")
+    @classmethod
+    def _legacy_lighting(cls, data: Any, info: ValidationInfo):
+        if not isinstance(data, dict) or _strict(info):
+            return data
+        v = data.get("base_lighting")
+        if v is None:
+            return data
+        if isinstance(v, (list, tuple)):
+            return data if all(isinstance(x, str) for x in v) else {**data, "base_lighting": [str(x) for x in v]}
+        return {**data, "base_lighting": [v if isinstance(v, str) else str(v)]}
+
+    @model_validator(mode="after")
+    def _strict_focal(self, info: ValidationInfo):
+        if _strict(info) and isinstance(self.lens_mm, str):
+            raise ValueError("st.lens_mm must be a number in strict mode")
+        return self
+
+
+class SceneDS(_SceneBlock):
+    TEXT_FIELDS = ("primary_action", "camera_move", "focus_transition", "lighting_event")
+    NUMBER_FIELDS = ("penetration_mm",)
+
+    primary_action: Optional[StrictStr] = Field(default=None, exclude_if=_unset)
+    camera_move: Optional[StrictStr] = Field(default=None, exclude_if=_unset)
+    focus_transition: Optional[StrictStr] = Field(default=None, exclude_if=_unset)
+    lighting_event: Optional[StrictStr] = Field(default=None, exclude_if=_unset)
+    penetration_mm: Optional[Union[_Number, StrictStr]] = Field(default=None, exclude_if=_unset, description="must be a number in strict mode")
+
+
+class SceneDW(_SceneBlock):
+    TEXT_FIELDS = ("micro_vfx", "ambient")
+
+    micro_vfx: Optional[StrictStr] = Field(default=None, exclude_if=_unset)
+    ambient: Optional[StrictStr] = Field(default=None, exclude_if=_unset)
+
+
 class SceneDraft(BaseModel):
-    st: Dict[str, Any]
-    ds: Dict[str, Any]
-    dw: Dict[str, Any]
+    st: SceneST
+    ds: SceneDS
+    dw: SceneDW
     timeline: List[TimelineBeat]
     drafts: Dict[str, str]
 
@@ -85,15 +238,161 @@ class QAReport(BaseModel):
 
 
 class QAValidateRequest(BaseModel):
-    scene: SceneDraft
-    engine: Literal["SORA", "VEO"] = "SORA"
+    scene: Optional[SceneDraft] = None
+    scene_ref: Optional[str] = Field(default=None, description="scene_id returned by expandScene (instead of the inline scene)")
+    engine: str = Field(default="SORA", description="registered engine renderer, e.g. SORA or VEO")
+
+    @model_validator(mode="after")
+    def _need_scene(self):
+        if self.scene is None and not self.scene_ref:
+            raise ValueError("scene or scene_ref is required")
+        return self
 
 
 class QAValidateResponse(BaseModel):
     engine_render: str
     report: QAReport
+    scene_hash: Optional[str] = Field(default=None, description="hash of the validated scene; only a /qa-validate result can be used as base_ref for qaValidateIncremental (stream, batch and /ws results are not stored)")
+
+
+class JSONPatchOp(BaseModel):
+    op: Literal["add", "replace", "remove"]
+    path: str = Field(description="JSON pointer into the scene, e.g. /ds/camera_move or /st/lens_mm")
+    value: Any = None
+
+
+class QAIncrementalRequest(BaseModel):
+    base_ref: str = Field(description="scene_hash from a previous QA call, or a scene_id/scene_ref")
+    patch: List[JSONPatchOp] = Field(default_factory=list)
+    engine: str = Field(default="SORA", description="registered engine renderer, e.g. SORA or VEO")
+
+
+class QACheckDiff(BaseModel):
+    check: str
+    before: Any
+    after: Any
+
+
+class QAIncrementalResponse(BaseModel):
+    base_ref: str
+    scene_hash: str
+    recomputed: List[str]
+    changed: List[QACheckDiff]
+    report: QAReport
+    engine_render: Optional[str] = Field(default=None, description="only present when the render text changed")
 
 
 # ★ 여기가 포인트: 엔드포인트가 반환하는 정확한 스키마
 class ExpandSceneResponse(BaseModel):
     scene: SceneDraft
+    scene_id: Optional[str] = Field(default=None, description="pass as scene_ref to qaValidate instead of re-sending the scene")
+
+
+# -----------------------------
+# Scene search (framing × lens × camera move × beats 조합 → QA 점수 top-k)
+# -----------------------------
+class SceneSearchRequest(BaseModel):
+    brief: str = Field(description="every variant's draft is scored against these words (story_match), so it drives the ranking")
+    selection: Optional[Concept] = None
+    selection_ref: Optional[str] = Field(default=None, description="Concept.id returned by deriveConcepts (instead of the inline selection)")
+    duration_sec: float = 3.0
+    beat_options: List[int] = Field(default_factory=lambda: [3, 5, 8], min_length=1, max_length=12, description="beat counts to try (1-12 each)")
+    engine: str = Field(default="SORA", description="registered engine renderer, e.g. SORA or VEO")
+    top_k: int = Field(default=5, ge=1, le=50)
+    max_candidates: int = Field(default=2000, ge=1, le=20000, description="enumeration stops after this many variants")
+
+    @model_validator(mode="after")
+    def _need_selection(self):
+        if self.selection is None and not self.selection_ref:
+            raise ValueError("selection or selection_ref is required")
+        if any(not 1 <= b <= 12 for b in self.beat_options):
+            raise ValueError("beat_options must be between 1 and 12")
+        return self
+
+
+class SceneVariant(BaseModel):
+    framing: str
+    lens_mm: int
+    dof: str
+    camera_move: str
+    beats: int
+
+
+class SceneCandidate(BaseModel):
+    rank: int
+    scene_id: str
+    variant: SceneVariant
+    report: QAReport
+    scene: SceneDraft
+
+
+class SceneSearchResponse(BaseModel):
+    evaluated: int
+    pruned: int = Field(description="variants dropped before scoring because an enabled QA rule on a searched field "
+                                    "(framing, lens, DOF, camera move, timeline, drafts) fired; 0 with the default rules")
+    candidates: List[SceneCandidate]
+
+
+# -----------------------------
+# Storyboard (트랙 전체 → scene 단위 NDJSON)
+# -----------------------------
+class LyricCue(BaseModel):
+    t: float = Field(ge=0.0, description="seconds from track start")
+    text: str
+
+
+class StoryboardRequest(BaseModel):
+    brief: Optional[str] = Field(default=None, description="accepted for parity with expandScene; scenes are built from the selection and beats")
+    selection: Optional[Concept] = None
+    selection_ref: Optional[str] = Field(default=None, description="Concept.id returned by deriveConcepts (instead of the inline selection)")
+    track_duration_sec: float = Field(gt=0.0, le=3600.0)
+    beats_per_scene: int = Field(default=8, ge=1, le=64)
+    beats: int = Field(default=0, ge=0, le=20000, description="total beats when neither tempo nor lyric timings are given (0 = one per 2 s)")
+    tempo_bpm: Optional[float] = Field(default=None, gt=0.0, le=300.0, description="one beat per quarter note, downbeat accent every 4")
+    lyric_timings: Optional[List[LyricCue]] = Field(default=None, max_length=20000, description="one beat per lyric line at its timestamp")
+
+    @model_validator(mode="after")
+    def _need_selection(self):
+        if self.selection is None and not self.selection_ref:
+            raise ValueError("selection or selection_ref is required")
+        if self.tempo_bpm and self.track_duration_sec * self.tempo_bpm / 60.0 > 20000:
+            raise ValueError("tempo_bpm × track_duration_sec exceeds 20000 beats")
+        return self
+
+
+class StoryboardScene(BaseModel):
+    index: int
+    t_start: float
+    t_end: float
+    scene_id: str = Field(description="content hash of the scene; storyboard scenes are not stored, so it is not a scene_ref")
+    scene: SceneDraft
+
+
+# -----------------------------
+# Pipeline (derive → compose → expand → QA, 서버에서 한 번에)
+# -----------------------------
+class PipelineItem(BaseModel):
+    album_info: AlbumInfo
+    controls: Optional[Controls] = None
+    pick: int = Field(default=0, ge=0, le=5, description="index of the derived concept carried into stills/scene/QA")
+    brief: Optional[str] = None
+    count: int = Field(3, ge=1, le=6)
+    duration_sec: float = 3.0
+    beats: int = Field(default=5, ge=1, le=12)
+    engine: str = Field(default="SORA", description="registered engine renderer, e.g. SORA or VEO")
+
+
+class PipelineBatchRequest(BaseModel):
+    items: List[PipelineItem] = Field(min_length=1, max_length=100)
+
+
+class PipelineResult(BaseModel):
+    concepts: List[Concept]
+    selection_id: str
+    stills: List[MJPrompt]
+    scene: SceneDraft
+    qa: QAValidateResponse
+
+
+class PipelineBatchResponse(BaseModel):
+    results: List[PipelineResult]
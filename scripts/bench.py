@@ -0,0 +1,335 @@
+#!/usr/bin/env python
+"""DirectorOS Actions API benchmark.
+
+test.http 샘플로 payload를 만들어 엔드포인트별 throughput / p50 / p99 를 잰다.
+
+    python scripts/bench.py                          # in-process (httpx ASGITransport)
+    python scripts/bench.py --spawn-uvicorn          # 로컬 uvicorn 띄워서
+    python scripts/bench.py --url http://127.0.0.1:8000
+    python scripts/bench.py --save scripts/bench_baseline.json
+    python scripts/bench.py --baseline scripts/bench_baseline.json --threshold 0.15   # 회귀면 exit 1
+    python scripts/bench.py --serialization          # response_model 경로 vs 직접 직렬화 (op별 before/after)
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import copy
+import json
+import os
+import platform
+import re
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+TOKEN = os.getenv("ACTIONS_BEARER", "").strip() or "bench-token"
+os.environ["ACTIONS_BEARER"] = TOKEN
+os.environ.setdefault("ADMISSION_LIMITS", "{}")   # in-process 측정이 토큰별 rate limit에 걸리지 않게
+
+import httpx  # noqa: E402
+
+
+# -----------------------------
+# Payloads (test.http 샘플 기반)
+# -----------------------------
+def load_http_samples(path: Path = ROOT / "test.http") -> Dict[str, Any]:
+    """'POST {{host}}/path' 블록의 JSON 본문을 path별로."""
+    samples: Dict[str, Any] = {}
+    for block in path.read_text(encoding="utf-8").split("###"):
+        m = re.search(r"^POST\s+\S*?(/[\w\-/]+)\s*$", block, re.M)
+        if not m:
+            continue
+        head, sep, body = block[m.end():].partition("\n\n")
+        if sep and body.strip():
+            samples[m.group(1)] = json.loads(body)
+    return samples
+
+
+def _suffix(i: int, vary: bool) -> str:
+    return f" #{i}" if vary else ""
+
+
+def make_generators(vary: bool) -> Dict[str, Tuple[str, str, Callable[[int], Optional[dict]]]]:
+    """op → (method, path, i → body). vary=True면 매 요청 본문이 달라 응답 캐시를 비켜간다."""
+    s = load_http_samples()
+    dc, cs, es, qa = s["/derive-concepts"], s["/compose-stills"], s["/expand-scene"], s["/qa-validate"]
+
+    def derive(i):
+        b = copy.deepcopy(dc)
+        b["album_info"]["title"] += _suffix(i, vary)
+        b["controls"] = {"variants": 1 + i % 6}
+        return b
+
+    def compose(i):
+        b = copy.deepcopy(cs)
+        b["selection"]["title"] += _suffix(i, vary)
+        b["count"] = 1 + i % 6
+        return b
+
+    def expand(i):
+        b = copy.deepcopy(es)
+        b["brief"] += _suffix(i, vary)
+        b["beats"] = 1 + i % 12
+        return b
+
+    def validate(i):
+        b = copy.deepcopy(qa)
+        b["scene"]["drafts"]["sora"] += _suffix(i, vary)
+        b["engine"] = "SORA" if i % 2 == 0 else "VEO"
+        return b
+
+    def search(i):
+        b = copy.deepcopy(es)
+        b["brief"] += _suffix(i, vary)
+        b.pop("beats", None)
+        b["top_k"] = 5
+        return b
+
+    def batch(i):
+        return {"items": [{"album_info": derive(i * 8 + k)["album_info"]} for k in range(8)]}
+
+    return {
+        "getHealth": ("GET", "/health", lambda i: None),
+        "deriveConcepts": ("POST", "/derive-concepts", derive),
+        "composeStills": ("POST", "/compose-stills", compose),
+        "expandScene": ("POST", "/expand-scene", expand),
+        "qaValidate": ("POST", "/qa-validate", validate),
+        "pipelineBatch": ("POST", "/pipeline/batch", batch),
+        "searchScenes": ("POST", "/expand-scene/search", search),
+    }
+
+
+# -----------------------------
+# Runner
+# -----------------------------
+def _pct(sorted_ms: List[float], q: float) -> float:
+    if not sorted_ms:
+        return 0.0
+    return sorted_ms[min(len(sorted_ms) - 1, int(q * len(sorted_ms)))]
+
+
+async def run_op(client: httpx.AsyncClient, method: str, path: str, gen, n: int, concurrency: int,
+                 offset: int = 0) -> Dict[str, Any]:
+    bodies = [gen(offset + i) for i in range(n)]
+    lat: List[float] = []
+    errors = 0
+    nxt = 0
+
+    async def worker():
+        nonlocal nxt, errors
+        while nxt < n:
+            i = nxt
+            nxt += 1
+            t0 = time.perf_counter()
+            r = await client.request(method, path, json=bodies[i])
+            lat.append((time.perf_counter() - t0) * 1000)
+            if r.status_code >= 400:
+                errors += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - t0
+    lat.sort()
+    return {
+        "n": n, "errors": errors, "rps": round(n / wall, 1),
+        "p50_ms": round(_pct(lat, 0.50), 3), "p99_ms": round(_pct(lat, 0.99), 3),
+    }
+
+
+async def run_all(client: httpx.AsyncClient, ops: List[str], n: int, concurrency: int, warmup: int, vary: bool):
+    gens = make_generators(vary)
+    results = {}
+    for op in ops:
+        method, path, gen = gens[op]
+        if warmup:
+            await run_op(client, method, path, gen, warmup, concurrency, offset=n)
+        results[op] = await run_op(client, method, path, gen, n, concurrency)
+    return results
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _spawn_uvicorn() -> Tuple[subprocess.Popen, str]:
+    port = _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env={**os.environ, "ACTIONS_BEARER": TOKEN},
+    )
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            if httpx.get(url + "/health").status_code == 200:
+                return proc, url
+        except httpx.TransportError:
+            pass
+        time.sleep(0.1)
+    proc.terminate()
+    raise SystemExit("uvicorn did not come up")
+
+
+# -----------------------------
+# Serialization: FastAPI response_model 경로(before) vs app._dump_json(after)
+# -----------------------------
+def serialization_bench(n: int) -> Dict[str, Any]:
+    sys.path.insert(0, str(ROOT))
+    os.chdir(ROOT)
+    import app as A
+    import models as M
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import APIRoute, serialize_response
+
+    gens = make_generators(True)
+    routes = {r.operation_id: r for r in A.app.routes if isinstance(r, APIRoute)}
+
+    def incremental(body):
+        qa = A._qa_validate_core(A._resolved(M.QAValidateRequest.model_validate(body)), remember=True)
+        patch = [{"op": "replace", "path": "/ds/camera_move", "value": "static"}]
+        return A._qa_incremental_core(M.QAIncrementalRequest(base_ref=qa.scene_hash, patch=patch))
+
+    cases = {
+        "deriveConcepts": lambda b: A._derive_concepts_core(M.DeriveConceptsRequest.model_validate(b)),
+        "composeStills": lambda b: A._compose_stills_core(A._resolved(M.ComposeStillsRequest.model_validate(b))),
+        "expandScene": lambda b: A._expand_scene_core(A._resolved(M.ExpandSceneRequest.model_validate(b))),
+        "qaValidate": lambda b: A._qa_validate_core(A._resolved(M.QAValidateRequest.model_validate(b)), remember=True),
+        "qaValidateIncremental": incremental,
+        "pipelineBatch": lambda b: A._pipeline_batch_core(M.PipelineBatchRequest.model_validate(b)),
+    }
+    sample_op = {"qaValidateIncremental": "qaValidate"}
+
+    async def before(field, objs):
+        out = []
+        for obj in objs:
+            content = await serialize_response(field=field, response_content=obj, is_coroutine=True)
+            out.append(JSONResponse(content).body)
+        return out
+
+    results = {}
+    for op, core in cases.items():
+        gen = gens[sample_op.get(op, op)][2]
+        objs = [core(gen(i)) for i in range(n)]
+        t0 = time.perf_counter()
+        old = asyncio.run(before(routes[op].response_field, objs))
+        t1 = time.perf_counter()
+        new = [A._dump_json(obj) for obj in objs]
+        t2 = time.perf_counter()
+        mismatch = sum(json.loads(a) != json.loads(b) for a, b in zip(old, new))
+        results[op] = {
+            "n": n, "before_us": round((t1 - t0) / n * 1e6, 1), "after_us": round((t2 - t1) / n * 1e6, 1),
+            "speedup": round((t1 - t0) / (t2 - t1), 1), "mismatch": mismatch,
+        }
+    return results
+
+
+# -----------------------------
+# Baseline 비교
+# -----------------------------
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    regressions = []
+    for op, cur in current["ops"].items():
+        base = baseline.get("ops", {}).get(op)
+        if not base:
+            continue
+        for key in ("p50_ms", "p99_ms"):
+            if base[key] and cur[key] > base[key] * (1 + threshold):
+                regressions.append(f"{op} {key}: {base[key]} → {cur[key]}")
+        if base["rps"] and cur["rps"] < base["rps"] * (1 - threshold):
+            regressions.append(f"{op} rps: {base['rps']} → {cur['rps']}")
+        if cur["errors"] > base.get("errors", 0):
+            regressions.append(f"{op} errors: {base.get('errors', 0)} → {cur['errors']}")
+    return regressions
+
+
+def print_table(ops: Dict[str, Any]):
+    print(f"{'op':<16}{'n':>7}{'err':>6}{'rps':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for op, r in ops.items():
+        print(f"{op:<16}{r['n']:>7}{r['errors']:>6}{r['rps']:>10}{r['p50_ms']:>10}{r['p99_ms']:>10}")
+
+
+def main(argv=None):
+    gens = make_generators(True)
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = p.add_mutually_exclusive_group()
+    target.add_argument("--url", help="기존 서버에 붙기 (기본: in-process ASGI)")
+    target.add_argument("--spawn-uvicorn", action="store_true", help="로컬 uvicorn을 띄워서 측정")
+    p.add_argument("--ops", default=",".join(gens), help="쉼표 구분 operationId")
+    p.add_argument("-n", "--requests", type=int, default=500, help="op당 요청 수")
+    p.add_argument("-c", "--concurrency", type=int, default=8)
+    p.add_argument("--warmup", type=int, default=50)
+    p.add_argument("--no-vary", action="store_true", help="같은 본문 반복 (응답 캐시 hit 경로)")
+    p.add_argument("--save", help="결과 JSON 저장 경로")
+    p.add_argument("--baseline", help="비교할 baseline JSON")
+    p.add_argument("--threshold", type=float, default=0.15, help="허용 회귀 비율 (0.15 = 15%%)")
+    p.add_argument("--serialization", action="store_true", help="응답 직렬화만 op별 before/after (in-process)")
+    args = p.parse_args(argv)
+
+    if args.serialization:
+        results = serialization_bench(args.requests)
+        print(f"{'op':<24}{'n':>6}{'before us':>12}{'after us':>12}{'x':>7}{'diff':>6}")
+        for op, r in results.items():
+            print(f"{op:<24}{r['n']:>6}{r['before_us']:>12}{r['after_us']:>12}{r['speedup']:>7}{r['mismatch']:>6}")
+        return 1 if any(r["mismatch"] for r in results.values()) else 0
+
+    ops = [o.strip() for o in args.ops.split(",") if o.strip()]
+    unknown = set(ops) - set(gens)
+    if unknown:
+        p.error(f"unknown ops: {', '.join(sorted(unknown))}")
+
+    proc = None
+    if args.url or args.spawn_uvicorn:
+        if args.spawn_uvicorn:
+            proc, url = _spawn_uvicorn()
+        else:
+            url = args.url.rstrip("/")
+        transport, target_name = None, url
+    else:
+        sys.path.insert(0, str(ROOT))
+        os.chdir(ROOT)
+        import app as app_module
+        transport, target_name = httpx.ASGITransport(app=app_module.app), "inproc"
+        url = "http://bench"
+
+    async def go():
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(
+            transport=transport, base_url=url, limits=limits, timeout=60,
+            headers={"Authorization": f"Bearer {TOKEN}"},
+        ) as client:
+            return await run_all(client, ops, args.requests, args.concurrency, args.warmup, not args.no_vary)
+
+    try:
+        results = asyncio.run(go())
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    report = {
+        "target": target_name, "requests": args.requests, "concurrency": args.concurrency,
+        "vary": not args.no_vary, "python": platform.python_version(), "ts": int(time.time()), "ops": results,
+    }
+    print_table(results)
+    if args.save:
+        Path(args.save).write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+        print(f"[OK] saved → {args.save}")
+    if args.baseline:
+        regressions = compare(report, json.loads(Path(args.baseline).read_text(encoding="utf-8")), args.threshold)
+        if regressions:
+            print("REGRESSION (>{:.0%}):".format(args.threshold))
+            for r in regressions:
+                print("  " + r)
+            return 1
+        print("[OK] within {:.0%} of baseline".format(args.threshold))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
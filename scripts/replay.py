@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+"""Request journal replay.
+
+JOURNAL_DIR 로 쌓인 journal.*.jsonl / journal.*.jsonl.gz 를 스트리밍으로 읽어 app 에 다시 쏜다.
+
+    python scripts/replay.py journal/                       # in-process, 원래 간격 그대로
+    python scripts/replay.py journal/ --speed 10            # 10배 빠르게
+    python scripts/replay.py journal/ --speed 0 -c 32       # 간격 무시, 동시 32
+    python scripts/replay.py journal/*.gz --url http://127.0.0.1:8000 --ops qaValidate,expandScene
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import glob
+import gzip
+import heapq
+import json
+import mmap
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+TOKEN = os.getenv("ACTIONS_BEARER", "").strip() or "replay-token"
+os.environ["ACTIONS_BEARER"] = TOKEN
+os.environ.setdefault("ADMISSION_LIMITS", "{}")   # in-process 측정이 토큰별 rate limit에 걸리지 않게
+
+import httpx  # noqa: E402
+
+
+def journal_files(paths: List[str]) -> List[str]:
+    out: List[str] = []
+    for p in paths:
+        if os.path.isdir(p):
+            out += glob.glob(os.path.join(p, "journal.*.jsonl.gz")) + glob.glob(os.path.join(p, "journal.*.jsonl"))
+        else:
+            out += glob.glob(p)
+    return sorted(set(out), key=os.path.getmtime)
+
+
+def iter_records(path: str) -> Iterator[Dict[str, Any]]:
+    """gz는 스트리밍 해제, 평문은 mmap 으로 줄 단위 (파일 전체를 메모리에 올리지 않는다)."""
+    if path.endswith(".gz"):
+        with gzip.open(path, "rb") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        return
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for line in iter(mm.readline, b""):
+                if line.strip():
+                    yield json.loads(line)
+
+
+def request_body(rec: Dict[str, Any]) -> Optional[bytes]:
+    req = rec.get("request") or {}
+    if req.get("truncated"):
+        return None
+    if "body" in req:
+        return json.dumps(req["body"], ensure_ascii=False).encode()
+    if "body_text" in req:
+        return req["body_text"].encode()
+    return b""
+
+
+async def replay(client: httpx.AsyncClient, records: Iterator[Dict[str, Any]], speed: float, concurrency: int,
+                 ops: Optional[set]) -> Dict[str, Any]:
+    sem = asyncio.Semaphore(concurrency)
+    stats: Dict[str, Dict[str, Any]] = {}
+    skipped = 0
+    pending = set()
+    t_first = None
+    wall0 = time.perf_counter()
+
+    async def fire(rec, body):
+        async with sem:
+            headers = {**(rec.get("headers") or {}), "Authorization": f"Bearer {TOKEN}"}
+            headers.pop("content-length", None)
+            url = rec["path"] + (f"?{rec['query']}" if rec.get("query") else "")
+            t0 = time.perf_counter()
+            r = await client.request(rec["method"], url, content=body, headers=headers)
+            ms = (time.perf_counter() - t0) * 1000
+        st = stats.setdefault(rec["op"], {"n": 0, "status_mismatch": 0, "lat": []})
+        st["n"] += 1
+        st["lat"].append(ms)
+        if r.status_code != rec.get("status"):
+            st["status_mismatch"] += 1
+
+    for rec in records:
+        if ops and rec.get("op") not in ops:
+            continue
+        body = request_body(rec)
+        if body is None:
+            skipped += 1
+            continue
+        if speed > 0:
+            if t_first is None:
+                t_first = rec["ts"]
+            due = (rec["ts"] - t_first) / speed - (time.perf_counter() - wall0)
+            if due > 0:
+                await asyncio.sleep(due)
+        task = asyncio.create_task(fire(rec, body))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+        if len(pending) >= concurrency * 4:   # 읽기가 너무 앞서가지 않게
+            await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+    if pending:
+        await asyncio.gather(*pending)
+
+    wall = time.perf_counter() - wall0
+    report = {"wall_sec": round(wall, 3), "skipped_truncated": skipped, "ops": {}}
+    for op, st in sorted(stats.items()):
+        lat = sorted(st["lat"])
+        report["ops"][op] = {
+            "n": st["n"], "status_mismatch": st["status_mismatch"], "rps": round(st["n"] / wall, 1) if wall else 0.0,
+            "p50_ms": round(lat[len(lat) // 2], 3), "p99_ms": round(lat[min(len(lat) - 1, int(0.99 * len(lat)))], 3),
+        }
+    return report
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("paths", nargs="+", help="journal 디렉터리 또는 파일(glob)")
+    p.add_argument("--url", help="기존 서버 (기본: in-process ASGI)")
+    p.add_argument("--speed", type=float, default=1.0, help="원래 간격 대비 배속 (0 = 간격 무시)")
+    p.add_argument("-c", "--concurrency", type=int, default=16)
+    p.add_argument("--ops", help="쉼표 구분 operationId만")
+    args = p.parse_args(argv)
+
+    files = journal_files(args.paths)
+    if not files:
+        p.error("no journal files found")
+    ops = {o.strip() for o in args.ops.split(",") if o.strip()} if args.ops else None
+
+    if args.url:
+        transport, base = None, args.url.rstrip("/")
+    else:
+        sys.path.insert(0, str(ROOT))
+        os.chdir(ROOT)
+        import app as app_module
+        transport, base = httpx.ASGITransport(app=app_module.app), "http://replay"
+
+    def records():
+        # serve.py worker마다 journal.<pid> 파일이 따로라 파일을 이어 붙이면 ts가 경계마다 되돌아간다.
+        # 파일 안은 ts 순이므로 ts로 k-way merge 해서 원래 간격과 섞임을 그대로 재현한다.
+        return heapq.merge(*(iter_records(f) for f in files), key=lambda r: r["ts"])
+
+    async def go():
+        async with httpx.AsyncClient(transport=transport, base_url=base, timeout=60) as client:
+            return await replay(client, records(), args.speed, args.concurrency, ops)
+
+    report = asyncio.run(go())
+    print(json.dumps(report, indent=2))
+    return 1 if any(o["status_mismatch"] for o in report["ops"].values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
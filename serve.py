@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+"""Production launcher.
+
+    python serve.py                                          # HOST/PORT, worker 1개 (fork 없이)
+    STORE_SQLITE_PATH=store.db WEB_CONCURRENCY=4 python serve.py   # worker 4개 (기본: 쓸 수 있는 코어 수)
+
+object store / QA state / 응답 cache / admission 한도는 프로세스마다 따로다. worker가 여럿이면
+selection_ref·scene_ref·base_ref 가 다른 worker에 떨어져 404가 나므로, 공유 store(STORE_SQLITE_PATH)가
+있을 때만 여러 worker를 띄운다 (없는데 WEB_CONCURRENCY>1 이면 시작하지 않는다). admission 한도는 worker당이다.
+worker마다 process pool(SEARCH_WORKERS, 기본 코어 수 / worker 수)을 하나씩 띄우므로 합쳐서 코어 수 만큼이다.
+
+부모가 import + warmup을 한 번 끝낸 뒤(preload) 소켓을 열고 worker를 fork 한다. worker는 uvloop/httptools
+uvicorn Server로 같은 소켓을 accept 한다. SIGTERM/SIGINT → worker에 SIGTERM 전달, 각자 in-flight 요청을
+SERVE_GRACEFUL_SEC 동안 마저 처리하고 종료(그 뒤에도 남으면 SIGKILL). 죽은 worker는 다시 띄운다.
+시작 시 import / app 구성 / warmup 단계별 ms를 한 줄 JSON으로 남긴다 (/metrics?format=json 의 startup).
+"""
+from __future__ import annotations
+
+import json
+import os
+import signal
+import socket
+import sys
+import time
+
+T0 = time.perf_counter()
+import fastapi  # noqa: E402,F401
+import pydantic  # noqa: E402,F401
+import uvicorn  # noqa: E402
+import models  # noqa: E402,F401
+T_DEPS = time.perf_counter()
+import app as app_module  # noqa: E402
+T_APP = time.perf_counter()
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+GRACEFUL_SEC = float(os.getenv("SERVE_GRACEFUL_SEC", "30"))
+LOG_LEVEL = os.getenv("LOG_LEVEL", "info")
+
+
+def _log(event: str, **fields):
+    print(json.dumps({"event": event, "pid": os.getpid(), **fields}), file=sys.stderr, flush=True)
+
+
+def _workers() -> int:
+    # 기본값 계산은 app 쪽 (process pool 크기를 worker 수로 나누는 데도 쓴다)
+    workers = app_module.WEB_CONCURRENCY
+    if workers > 1 and not app_module.STORE_SQLITE_PATH:
+        raise SystemExit(f"WEB_CONCURRENCY={workers} needs a shared store: set STORE_SQLITE_PATH "
+                         "(selection_ref/scene_ref lookups are per-process otherwise)")
+    return workers
+
+
+def _has(module: str) -> bool:
+    try:
+        __import__(module)
+        return True
+    except ImportError:
+        return False
+
+
+def _config() -> uvicorn.Config:
+    return uvicorn.Config(
+        app_module.app,
+        loop="uvloop" if _has("uvloop") else "auto",
+        http="httptools" if _has("httptools") else "auto",
+        proxy_headers=True,
+        forwarded_allow_ips="*",
+        timeout_graceful_shutdown=GRACEFUL_SEC,
+        log_level=LOG_LEVEL,
+    )
+
+
+def _bind() -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in HOST else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((HOST, PORT))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _serve(sock: socket.socket):
+    # process pool / thread lane은 worker마다 (fork 뒤) 요청 받기 전에 띄운다
+    app_module.warm_pools()
+    # uvicorn이 SIGTERM/SIGINT를 받아 새 연결을 끊고 in-flight 요청을 마저 처리한다
+    uvicorn.Server(_config()).run(sockets=[sock])
+
+
+def _spawn(sock: socket.socket) -> int:
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        code = 0
+        try:
+            _serve(sock)
+        except BaseException:
+            code = 1
+            raise
+        finally:
+            os._exit(code)
+    return pid
+
+
+def main() -> int:
+    workers = _workers()
+    warm = app_module.warmup()
+    t_warm = time.perf_counter()
+    report = {
+        "import_deps_ms": round((T_DEPS - T0) * 1000, 1),
+        "import_app_ms": round((T_APP - T_DEPS) * 1000, 1),
+        "warmup_ms": round((t_warm - T_APP) * 1000, 1),
+        "warmup": warm,
+        "total_ms": round((t_warm - T0) * 1000, 1),
+        "workers": workers,
+    }
+    app_module.STARTUP_REPORT.update(report)
+    sock = _bind()
+    _log("ready", bind=f"{HOST}:{PORT}", **report)
+
+    if workers == 1 or not hasattr(os, "fork"):
+        _serve(sock)
+        return 0
+
+    children = {_spawn(sock) for _ in range(workers)}
+    stopping = {"deadline": None}
+
+    def on_signal(signum, frame):
+        if stopping["deadline"] is None:
+            stopping["deadline"] = time.monotonic() + GRACEFUL_SEC + 5
+            _log("draining", signal=signum, workers=len(children))
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, on_signal)
+    signal.signal(signal.SIGINT, on_signal)
+
+    while children:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid == 0:
+            if stopping["deadline"] is not None and time.monotonic() > stopping["deadline"]:
+                for pid in children:
+                    os.kill(pid, signal.SIGKILL)
+            time.sleep(0.2)
+            continue
+        children.discard(pid)
+        if stopping["deadline"] is None:
+            _log("worker_exit", worker=pid, status=status)
+            time.sleep(1)   # crash loop 완화
+            children.add(_spawn(sock))
+    sock.close()
+    _log("stopped")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())